@@ -1,11 +1,27 @@
 import os
 import re
-import yaml
+import hashlib
 import json
 import html
 import getpass
+import argparse
+import functools
+import logging
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
-from src.linux_auditor import LinuxAuditor
+from src.recording import RecordingAuditor, ReplayAuditor, recorded_hosts, PASSWORD_PLACEHOLDER
+from src.result_matrix import ResultMatrix
+from src.rule_loader import load_rules
+from src.check_result import CheckResult, rule_meta_from_rule, result_to_json, host_result_from_dict
+from src.eval_cache import get_evaluation_cache
+from src.timing import TIMINGS
+from src.checkpoint import RunCheckpoint
+from src.preconditions import PreconditionGraph, rule_precondition_failure
+from src.limits import LIMITS_COMMAND, LIMITS_EVALUATORS, evaluate_limits
+from src.packages import PACKAGES_COMMAND, PACKAGES_EVALUATORS, evaluate_packages
+from src.astra_control import control_command, control_key, query_controls
 from rich.console import Console
 from rich.table import Table
 from rich.align import Align
@@ -13,11 +29,17 @@ from rich.box import ROUNDED
 from rich.panel import Panel
 
 console = Console()
+logger = logging.getLogger(__name__)
 
-def load_rules(rules_file):
-    """Загрузка правил из YAML файла"""
-    with open(rules_file, 'r') as f:
-        return yaml.safe_load(f)
+# Бюджет времени импорта main.py и модули, которые не должны загружаться без проверки машин
+IMPORT_BUDGET_MS = 150
+HEAVY_MODULES = ('paramiko', 'cryptography', 'yaml', 'numpy', 'multiprocessing', 'http.server', 'tarfile', 'asyncio')
+
+# Типы правил с общей командой: выполняется один раз на машину, оценка локальная
+SHARED_RULE_COMMANDS = {
+    'limits': LIMITS_COMMAND,
+    'package_version': PACKAGES_COMMAND,
+}
 
 def get_password():
     """Безопасный ввод пароля"""
@@ -60,141 +82,270 @@ def check_list_versions(version_output, expected_versions):
     else:
         return "FAIL", f"Version {current_major}.{current_minor} < required {current_major}.{required_minor}"
 
-def run_linux_audit(host, username, password, rules_file):
-    """Запуск аудита для Linux хоста"""
+def evaluate_rule(rule_type, expected, output):
+    """Оценка вывода команды по типу правила, возвращает (status, actual_display)"""
+    status = "FAIL"
+    actual_display = output
+    
+    if rule_type == 'numeric_max':
+        # Числовая проверка на "не более" (<=)
+        actual_value = extract_number(output)
+        expected_value = extract_number(expected)
+        
+        if actual_value is not None and expected_value is not None:
+            status = "PASS" if actual_value <= expected_value else "FAIL"
+            actual_display = f"{actual_value} (<= {expected_value})"
+        else:
+            status = "ERROR"
+            actual_display = f"Failed to extract numbers: {output}"
+            
+    elif rule_type == 'numeric_min':
+        # Числовая проверка на "не менее" (>=)
+        actual_value = extract_number(output)
+        expected_value = extract_number(expected)
+        
+        if actual_value is not None and expected_value is not None:
+            status = "PASS" if actual_value >= expected_value else "FAIL"
+            actual_display = f"{actual_value} (>= {expected_value})"
+        else:
+            status = "ERROR"
+            actual_display = f"Failed to extract numbers: {output}"
+            
+    elif rule_type == 'numeric_equals':
+        # Точное числовое совпадение (==)
+        actual_value = extract_number(output)
+        expected_value = extract_number(expected)
+        
+        if actual_value is not None and expected_value is not None:
+            status = "PASS" if actual_value == expected_value else "FAIL"
+            actual_display = f"{actual_value} (== {expected_value})"
+        else:
+            status = "ERROR"
+            actual_display = f"Failed to extract numbers: {output}"
+            
+    elif rule_type == 'contains':
+        # Проверка на наличие подстроки
+        status = "PASS" if expected in output else "FAIL"
+        
+    elif rule_type == 'not_contains':
+        # Проверка на отсутствие подстроки
+        status = "PASS" if expected not in output else "FAIL"
+        
+    elif rule_type == 'text':
+        # Точное текстовое совпадение
+        status = "PASS" if output.strip() == expected.strip() else "FAIL"
+        
+    elif rule_type == 'contains_multiple' or rule_type == 'astra_control':
+        # Проверка на наличие нескольких подстрок
+        all_found = all(substring in output for substring in expected.split())
+        status = "PASS" if all_found else "FAIL"
+        
+    elif rule_type == 'file_contains_lines':
+        # Проверка что файл содержит все указанные строки
+        expected_lines = expected.strip().split('\n')
+        missing_lines = []
+        for line in expected_lines:
+            if line.strip() and line.strip() not in output:
+                missing_lines.append(line.strip())
+        
+        status = "PASS" if not missing_lines else "FAIL"
+        actual_display = f"Missing lines: {missing_lines}" if missing_lines else "All lines found"
+    
+    elif rule_type == 'list_versions':
+        # НОВАЯ ПРОВЕРКА: версия PostgreSQL
+        status, check_message = check_list_versions(output, expected)
+        actual_display = f"{output.strip()} | {check_message}"
+
+    elif rule_type == 'limits':
+        # Действующее значение из limits.conf и limits.d с учетом приоритетов
+        status, actual_display = evaluate_limits(expected, output)
+
+    elif rule_type == 'package_version':
+        # Версии пакетов из общего списка dpkg-query, сравнение по правилам Debian
+        status, actual_display = evaluate_packages(expected, output)
+
+    else:
+        # Старая текстовая проверка (для совместимости)
+        status = "PASS" if output in expected else "FAIL"
+    
+    return status, actual_display
+
+@functools.lru_cache(maxsize=None)
+def evaluator_version():
+    """Отпечаток кода оценки правил: сохраненный кэш вердиктов от старой версии не используется"""
+    digest = hashlib.sha256()
+    
+    def add_code(code):
+        digest.update(code.co_code)
+        for const in code.co_consts:
+            # Вложенные функции и генераторы хешируем по их коду, а не по адресу
+            if hasattr(const, 'co_code'):
+                add_code(const)
+            else:
+                digest.update(repr(const).encode('utf-8'))
+    
+    for func in (evaluate_rule, check_list_versions, extract_number) + LIMITS_EVALUATORS + PACKAGES_EVALUATORS:
+        add_code(func.__code__)
+    return digest.hexdigest()[:16]
+
+def rule_command(rule, password):
+    """Команда правила с подставленным паролем"""
+    command = rule['check'].get('command')
+    if not command and rule.get('type') == 'astra_control':
+        command = control_command(*control_key(rule['check']))
+    elif not command:
+        # Правила с общей командой (limits, package_version) могут ее не указывать
+        command = SHARED_RULE_COMMANDS[rule.get('type')]
+    return command.replace('{password}', password)
+
+def selected_rules(rules_data, options):
+    """Правила запуска с учетом --severity, --tags и --rules"""
+    rules = rules_data.get('rules', [])
+    rule_filter = options.get('rule_filter')
+    if not rule_filter:
+        return rules
+    from src.rule_selection import select_rules
+    return select_rules(rules, *rule_filter)
+
+def make_auditor(host, username, password, options):
+    """Аудитор для машины: SSH, локальный снимок файловой системы или запись"""
+    if options.get('backend') == 'snapshot':
+        from src.local_auditor import LocalAuditor
+        auditor = LocalAuditor(host, username, password)
+    elif options.get('backend') == 'replay':
+        auditor = ReplayAuditor(host, username, password, directory=options['replay_dir'])
+    else:
+        # paramiko загружается только когда действительно нужен SSH
+        from src.linux_auditor import LinuxAuditor
+        group = options.get('groups', {}).get(host)
+        bastions = options.get('group_bastions', {}).get(group) or options.get('bastions')
+        auditor = LinuxAuditor(host, username, password, bastions=bastions)
+    if options.get('record_dir'):
+        auditor = RecordingAuditor(auditor, options['record_dir'])
+    if options.get('auditor_pool') is not None and hasattr(auditor, 'is_connected'):
+        # Служба: живая сессия с машиной берется из пула и возвращается в него
+        auditor = options['auditor_pool'].checkout(host, auditor)
+    return auditor
+
+def run_linux_audit(host, username, password, rules_file, options=None, stats=None):
+    """Запуск аудита для Linux хоста.
+    
+    В stats (если передан) записываются отпечатки входных файлов правил
+    и список правил, результат которых отличается от эталона.
+    """
+    options = options or {}
     
     # Загружаем правила
     rules_data = load_rules(rules_file)
-    rules = rules_data.get('rules', [])
+    rules = selected_rules(rules_data, options)
     
     # Создаем аудитор и подключаемся
-    auditor = LinuxAuditor(host, username, password)
+    auditor = make_auditor(host, username, password, options)
     if not auditor.connect():
         return None
     
     results = []
+    eval_cache = get_evaluation_cache(options.get('eval_cache'), evaluator_version())
+    # Вывод по каждой команде: одинаковые команды разных правил выполняются один раз
+    outputs = {}
     
-    # Выполняем проверки по каждому правилу
-    for rule in rules:
-        rule_id = rule['id']
-        rule_name = rule['name']
-        rule_type = rule.get('type', 'text')
+    try:
+        # Предусловия проверяются одной командой; правила с невыполненными не запускаются
+        failed_preconditions = {}
+        if rules_data.get('preconditions'):
+            with TIMINGS.span('preconditions', host, host):
+                failed_preconditions = PreconditionGraph(rules_data['preconditions']).evaluate(auditor, rules)
+        skipped = [rule_precondition_failure(rule, failed_preconditions) for rule in rules]
         
-        try:
-            # Выполняем команду из правила
-            command_template = rule['check']['command']
-            command = command_template.replace('{password}', password)
-            
-            # Выполняем команду из правила (с подставленным паролем)
-            output, error = auditor.execute_command(command)
-            #output, error = auditor.execute_command(rule['check']['command'])
-            
-            # Умная проверка в зависимости от типа
-            expected = rule['check']['expect']
-            status = "FAIL"
-            actual_display = output
+        commands = []
+        for rule, skip in zip(rules, skipped):
+            try:
+                commands.append(None if skip else rule_command(rule, password))
+            except (KeyError, TypeError, AttributeError, ValueError):
+                commands.append(None)
+        
+        # Режим эталона: правила с теми же входными файлами, что у эталона, не выполняем
+        golden = options.get('golden')
+        signatures = [None] * len(rules)
+        if golden is not None or options.get('collect_signatures'):
+            from src.drift import collect_signatures
+            try:
+                signatures = collect_signatures(auditor, commands, password)
+            except Exception as e:
+                logger.warning(f"Cannot hash rule inputs on {host}, running full audit: {e}")
+        reused = [golden is not None and golden.reusable(index, signature)
+                  for index, signature in enumerate(signatures)]
+        drift = []
+        
+        # Средства защиты Astra опрашиваются одним сценарием под sudo вместо sudo на каждое правило
+        controls = {}
+        for rule, command, skip in zip(rules, commands, reused):
+            if command is not None and not skip and rule.get('type') == 'astra_control' \
+                    and not rule['check'].get('command'):
+                controls[command] = control_key(rule['check'])
+        if len(controls) > 1:
+            try:
+                with TIMINGS.span('astra_control', f"{len(controls)} controls", host):
+                    statuses = query_controls(auditor, controls.values(), password)
+                outputs.update((command, statuses[key]) for command, key in controls.items() if key in statuses)
+            except Exception as e:
+                logger.warning(f"Astra control script failed on {host}, falling back to per-rule commands: {e}")
+        
+        if options.get('collector') and hasattr(auditor, 'run_collector'):
+            # Все команды одним скриптом за один exec_command
+            commands = list(dict.fromkeys(
+                command for command, skip in zip(commands, reused)
+                if command is not None and not skip and command not in outputs
+            ))
+            try:
+                outputs.update(zip(commands, auditor.run_collector(commands)))
+            except Exception as e:
+                logger.warning(f"Collector failed on {host}, falling back to per-rule commands: {e}")
+        
+        # Выполняем проверки по каждому правилу
+        for index, rule in enumerate(rules):
+            if reused[index]:
+                results.append(golden.results[index])
+                continue
             
-            if rule_type == 'numeric_max':
-                # Числовая проверка на "не более" (<=)
-                actual_value = extract_number(output)
-                expected_value = extract_number(expected)
-                
-                if actual_value is not None and expected_value is not None:
-                    status = "PASS" if actual_value <= expected_value else "FAIL"
-                    actual_display = f"{actual_value} (<= {expected_value})"
-                else:
-                    status = "ERROR"
-                    actual_display = f"Failed to extract numbers: {output}"
-                    
-            elif rule_type == 'numeric_min':
-                # Числовая проверка на "не менее" (>=)
-                actual_value = extract_number(output)
-                expected_value = extract_number(expected)
-                
-                if actual_value is not None and expected_value is not None:
-                    status = "PASS" if actual_value >= expected_value else "FAIL"
-                    actual_display = f"{actual_value} (>= {expected_value})"
-                else:
-                    status = "ERROR"
-                    actual_display = f"Failed to extract numbers: {output}"
-                    
-            elif rule_type == 'numeric_equals':
-                # Точное числовое совпадение (==)
-                actual_value = extract_number(output)
-                expected_value = extract_number(expected)
-                
-                if actual_value is not None and expected_value is not None:
-                    status = "PASS" if actual_value == expected_value else "FAIL"
-                    actual_display = f"{actual_value} (== {expected_value})"
-                else:
-                    status = "ERROR"
-                    actual_display = f"Failed to extract numbers: {output}"
-                    
-            elif rule_type == 'contains':
-                # Проверка на наличие подстроки
-                status = "PASS" if expected in output else "FAIL"
-                actual_display = output
-                
-            elif rule_type == 'not_contains':
-                # Проверка на отсутствие подстроки
-                status = "PASS" if expected not in output else "FAIL"
-                actual_display = output
-                
-            elif rule_type == 'text':
-                # Точное текстовое совпадение
-                status = "PASS" if output.strip() == expected.strip() else "FAIL"
-                actual_display = output
-                
-            elif rule_type == 'contains_multiple':
-                # Проверка на наличие нескольких подстрок
-                all_found = all(substring in output for substring in expected.split())
-                status = "PASS" if all_found else "FAIL"
-                actual_display = output
-                
-            elif rule_type == 'file_contains_lines':
-                # Проверка что файл содержит все указанные строки
-                expected_lines = expected.strip().split('\n')
-                missing_lines = []
-                for line in expected_lines:
-                    if line.strip() and line.strip() not in output:
-                        missing_lines.append(line.strip())
-                
-                status = "PASS" if not missing_lines else "FAIL"
-                actual_display = f"Missing lines: {missing_lines}" if missing_lines else "All lines found"
+            # Метаданные правила общие для всех хостов, в результате храним только ссылку
+            rule_meta = rule_meta_from_rule(rule)
             
-            elif rule_type == 'list_versions':
-                # НОВАЯ ПРОВЕРКА: версия PostgreSQL
-                status, check_message = check_list_versions(output, expected)
-                actual_display = f"{output.strip()} | {check_message}"
-
+            if skipped[index]:
+                # Команда не выполняется: статус задан предусловием
+                status, reason = skipped[index]
+                results.append(CheckResult(rule_meta, status, f"PRECONDITION_FAILED: {reason}"))
             else:
-                # Старая текстовая проверка (для совместимости)
-                status = "PASS" if output in expected else "FAIL"
-                actual_display = output
-            
-            result = {
-                'id': rule_id,
-                'name': rule_name,
-                'type': rule_type,
-                'status': status,
-                'expected': expected,
-                'actual': output,
-                'actual_display': actual_display,
-                'error': error
-            }
-            
-            results.append(result)
+                try:
+                    with TIMINGS.span('rule', rule_meta.id, host):
+                        command = rule_command(rule, password)
+                        
+                        # Выполняем команду из правила (с подставленным паролем)
+                        if command not in outputs:
+                            outputs[command] = auditor.execute_command(command)
+                        output, error = outputs[command]
+                        
+                        # Умная проверка в зависимости от типа; одинаковый вывод оценивается один раз
+                        with TIMINGS.span('evaluate', rule_meta.type, host):
+                            status, actual_display = eval_cache.evaluate(rule_meta, output, evaluate_rule)
+                    results.append(CheckResult(rule_meta, status, output, actual_display, error))
+                    
+                except Exception as e:
+                    results.append(CheckResult(rule_meta, 'ERROR', error=str(e)))
             
-        except Exception as e:
-            result = {
-                'id': rule_id,
-                'name': rule_name,
-                'status': 'ERROR',
-                'error': str(e)
-            }
-            results.append(result)
-    
-    auditor.disconnect()
+            if golden is not None:
+                reference = golden.results[index] if index < len(golden.results) else None
+                if reference is None or (reference.status, reference.actual) != (results[-1].status,
+                                                                                 results[-1].actual):
+                    drift.append(rule_meta.id)
+        
+        if stats is not None:
+            stats['signatures'] = signatures
+            if golden is not None:
+                stats['drift'] = drift
+                stats['reused'] = sum(reused)
+    finally:
+        auditor.disconnect()
     return results
 
 def extract_number(text):
@@ -214,7 +365,7 @@ def print_results_table(host, results):
     table.add_column("Actual")
     
     for result in results:
-        status_style = "green" if result['status'] == 'PASS' else "red"
+        status_style = {'PASS': "green", 'NOT_APPLICABLE': "dim"}.get(result['status'], "red")
         actual = result.get('actual_display', result.get('actual', 'N/A'))
         actual = (actual[:47] + "...") if len(str(actual)) > 50 else actual
         
@@ -228,6 +379,7 @@ def print_results_table(host, results):
     
     console.print(table)
 
+@TIMINGS.timed('report')
 def save_json_report(results, host):
     """Сохранение отчета в JSON файл"""
     report = {
@@ -243,47 +395,65 @@ def save_json_report(results, host):
     filename = f"reports/report_{host}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+        json.dump(report, f, indent=2, ensure_ascii=False, default=result_to_json)
     
     console.print(f"[green]Report saved to {filename}[/green]")
 
-def print_summary_statistics(all_results):
+def print_summary_statistics(all_results, matrix=None):
     """Вывод сводной статистики"""
+    if matrix is None:
+        matrix = ResultMatrix.from_results(all_results)
+    
     console.print(f"\n[bold yellow]📊 СВОДНАЯ СТАТИСТИКА[/bold yellow]")
     console.print("=" * 50)
     
-    total_hosts = len(all_results)
-    completed = sum(1 for r in all_results if r['status'] == 'completed')
-    failed = sum(1 for r in all_results if r['status'] == 'failed')
-    errors = sum(1 for r in all_results if r['status'] == 'error')
+    host_counts = matrix.host_status_counts()
+    total_hosts = len(matrix.hosts)
+    completed = host_counts['completed']
+    failed = host_counts['failed']
+    errors = host_counts['error']
+    unreachable = host_counts['unreachable']
     
     console.print(f"Всего машин: {total_hosts}")
     console.print(f"Успешно проверено: [green]{completed}[/green]")
     console.print(f"Неудачных проверок: [yellow]{failed}[/yellow]")
     console.print(f"Ошибок подключения: [red]{errors}[/red]")
+    if unreachable:
+        console.print(f"Недоступны (предварительный опрос): [red]{unreachable}[/red]")
     
     # Статистика по проверкам для успешных хостов
     if completed > 0:
-        total_checks = sum(len(r['results']) for r in all_results if r['status'] == 'completed')
-        total_passed = sum(r['summary']['passed'] for r in all_results if r['status'] == 'completed')
-        total_failed = sum(r['summary']['failed'] for r in all_results if r['status'] == 'completed')
+        check_counts = matrix.check_status_counts()
+        total_checks = len(matrix.cell_status)
+        total_passed = check_counts['PASS']
+        total_failed = check_counts['FAIL']
+        not_applicable = check_counts['NOT_APPLICABLE']
         
         console.print(f"\n[bold]По всем успешным проверкам:[/bold]")
         console.print(f"Всего проверок: {total_checks}")
         console.print(f"Успешных: [green]{total_passed}[/green]")
         console.print(f"Неуспешных: [red]{total_failed}[/red]")
+        if not_applicable:
+            console.print(f"Неприменимых: [dim]{not_applicable}[/dim]")
+            total_checks -= not_applicable
         success_rate = (total_passed / total_checks * 100) if total_checks > 0 else 0
         console.print(f"Процент успеха: [bold]{success_rate:.1f}%[/bold]")
 
-def save_summary_report(all_results):
+@TIMINGS.timed('report')
+def save_summary_report(all_results, matrix=None):
     """Сохранение сводного отчета по всем машинам"""
+    if matrix is None:
+        matrix = ResultMatrix.from_results(all_results)
+    
+    host_counts = matrix.host_status_counts()
     summary = {
         'timestamp': datetime.now().isoformat(),
         'summary': {
-            'total_hosts': len(all_results),
-            'completed': sum(1 for r in all_results if r['status'] == 'completed'),
-            'failed': sum(1 for r in all_results if r['status'] == 'failed'),
-            'errors': sum(1 for r in all_results if r['status'] == 'error')
+            'total_hosts': len(matrix.hosts),
+            'completed': host_counts['completed'],
+            'failed': host_counts['failed'],
+            'errors': host_counts['error'],
+            'unreachable': host_counts['unreachable']
         },
         'hosts': all_results
     }
@@ -294,13 +464,38 @@ def save_summary_report(all_results):
     json_filename = f"reports/summary_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
     with open(json_filename, 'w', encoding='utf-8') as f:
-        json.dump(summary, f, indent=2, ensure_ascii=False)
+        json.dump(summary, f, indent=2, ensure_ascii=False, default=result_to_json)
     
-    html_filename = save_html_report(all_results)
+    html_filename = save_html_report(all_results, matrix)
     
     console.print(f"[green]✓ JSON отчет сохранен: {json_filename}[/green]")
     console.print(f"[green]✓ HTML отчет сохранен: {html_filename}[/green]")
 
+def print_timing_table(limit=10):
+    """Таблицы самых медленных правил и хостов"""
+    slow_rules = TIMINGS.slowest('rule', limit=limit)
+    slow_hosts = TIMINGS.slowest('host', limit=limit)
+    
+    for title, rows in (("⏱ Самые медленные правила", slow_rules), ("⏱ Самые медленные машины", slow_hosts)):
+        if not rows:
+            continue
+        table = Table(title=title)
+        table.add_column("Правило / машина", style="cyan")
+        table.add_column("Всего, с", justify="right")
+        table.add_column("Запусков", justify="right")
+        table.add_column("Среднее, с", justify="right")
+        table.add_column("Максимум, с", justify="right")
+        for key, total, count, peak in rows:
+            table.add_row(str(key), f"{total:.2f}", str(count), f"{total / count:.3f}", f"{peak:.3f}")
+        console.print(table)
+
+def save_timing_report(formats=()):
+    """Сохранение замеров времени за запуск"""
+    os.makedirs('reports', exist_ok=True)
+    base_filename = f"reports/timings_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    for filename in TIMINGS.save(base_filename, formats):
+        console.print(f"[green]✓ Замеры времени сохранены: {filename}[/green]")
+
 def print_banner():
 
     banner_text = """
@@ -326,7 +521,80 @@ def print_banner():
     console.print(aligned_panel)
     console.print()
 
-def save_html_report(all_results):
+MAX_HEATMAP_GROUPS = 30
+
+def render_heatmap_section(matrix):
+    """HTML-секция с тепловой картой FAIL по правилам и группам хостов"""
+    ranked = matrix.rule_group_failures()
+    if not ranked:
+        return ""
+    
+    # Самые крупные группы - отдельными колонками, остальные сливаем в одну
+    group_sizes = matrix.group_sizes()
+    groups = sorted(group_sizes, key=lambda g: (-group_sizes[g], g))
+    shown_groups = groups[:MAX_HEATMAP_GROUPS]
+    other_groups = groups[MAX_HEATMAP_GROUPS:]
+    
+    header = "".join(
+        f'<th class="heatmap-cell">{html.escape(g)}<br><small>{group_sizes[g]}</small></th>'
+        for g in shown_groups
+    )
+    if other_groups:
+        header += f'<th class="heatmap-cell">Прочие<br><small>{sum(group_sizes[g] for g in other_groups)}</small></th>'
+    
+    rows = ""
+    for rank, row in enumerate(ranked, 1):
+        cells = [row['groups'].get(g, (0, 0)) for g in shown_groups]
+        if other_groups:
+            other = [row['groups'].get(g, (0, 0)) for g in other_groups]
+            cells.append((sum(f for f, _ in other), sum(t for _, t in other)))
+        
+        cells_html = ""
+        for failed, total in cells:
+            if not total:
+                cells_html += '<td class="heatmap-cell">—</td>'
+                continue
+            rate = failed / total
+            color = f"rgba(220, 53, 69, {0.15 + 0.85 * rate:.2f})" if failed else "#d4edda"
+            cells_html += (f'<td class="heatmap-cell" style="background: {color}" '
+                           f'title="{failed} из {total}">{rate * 100:.0f}%</td>')
+        
+        severity_class = "status-fail" if row['severity'] == 'HIGH' else "status-error"
+        rows += f"""
+                    <tr>
+                        <td>{rank}</td>
+                        <td>{html.escape(row['rule_id'])}</td>
+                        <td>{html.escape(str(row['name']))}</td>
+                        <td class="{severity_class}">{html.escape(str(row['severity']))}</td>
+                        <td>{row['failed']} / {row['total']} ({row['rate'] * 100:.0f}%)</td>
+                        {cells_html}
+                    </tr>"""
+    
+    return f"""
+        <div class="heatmap-table">
+            <div class="section-title">
+                <h2>🔥 Рейтинг несоответствий по парку ({len(ranked)})</h2>
+                <p>Правила отсортированы по числу FAIL с учетом критичности, ячейки - доля FAIL в группе хостов</p>
+            </div>
+            <table>
+                <thead>
+                    <tr>
+                        <th>#</th>
+                        <th>Правило</th>
+                        <th>Название проверки</th>
+                        <th>Критичность</th>
+                        <th>FAIL / Всего</th>
+                        {header}
+                    </tr>
+                </thead>
+                <tbody>{rows}
+                </tbody>
+            </table>
+        </div>
+"""
+
+@TIMINGS.timed('report')
+def save_html_report(all_results, matrix=None):
     """Сохранение отчета в HTML формате с таблицей ошибок и улучшенными заголовками"""
     os.makedirs('reports', exist_ok=True)
     
@@ -334,23 +602,25 @@ def save_html_report(all_results):
     filename = f"reports/report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
     
     # Подсчет статистики
-    total_hosts = len(all_results)
-    completed_hosts = sum(1 for r in all_results if r['status'] == 'completed')
-    failed_hosts = sum(1 for r in all_results if r['status'] == 'failed')
-
+    if matrix is None:
+        matrix = ResultMatrix.from_results(all_results)
+    host_counts = matrix.host_status_counts()
+    check_counts = matrix.check_status_counts()
+    host_scores = matrix.host_scores()
+    
+    total_hosts = len(matrix.hosts)
+    completed_hosts = host_counts['completed']
+    failed_hosts = host_counts['failed']
+    total_failed_checks = check_counts['FAIL']
+    total_passed_checks = check_counts['PASS']
     
-    # Собираем все FAIL и ERROR проверки для сводной таблицы
+    # Собираем все FAIL проверки для сводной таблицы
     all_failed_checks = []
-    total_failed_checks = 0
-    total_passed_checks = 0
     
     for host_result in all_results:
         if host_result['status'] == 'completed' and 'results' in host_result:
             for check in host_result['results']:
-                if check['status'] == 'PASS':
-                    total_passed_checks += 1
-                elif check['status'] == 'FAIL':
-                    total_failed_checks += 1
+                if check['status'] == 'FAIL':
                     all_failed_checks.append({
                         'host': host_result['host'],
                         'rule_id': check['id'],
@@ -476,6 +746,7 @@ def save_html_report(all_results):
         .status-pass {{ color: green; font-weight: bold; }}
         .status-fail {{ color: red; font-weight: bold; }}
         .status-error {{ color: orange; font-weight: bold; }}
+        .status-na {{ color: gray; }}
         .timestamp {{
             text-align: right;
             color: #666;
@@ -512,6 +783,22 @@ def save_html_report(all_results):
             border-radius: 5px;
             margin: 20px 0;
         }}
+        .heatmap-table {{
+            margin: 30px 0;
+            max-height: 600px;
+            overflow: auto;
+        }}
+        .heatmap-table table {{
+            font-size: 12px;
+        }}
+        .heatmap-table th, .heatmap-table td {{
+            padding: 4px 6px;
+            white-space: nowrap;
+        }}
+        .heatmap-cell {{
+            text-align: center;
+            min-width: 48px;
+        }}
     </style>
 </head>
 <body>
@@ -559,6 +846,9 @@ def save_html_report(all_results):
             <p><strong>Время проверки:</strong> {timestamp}</p>
         </div>
 
+        <!-- Тепловая карта: правило x группа хостов -->
+        {render_heatmap_section(matrix)}
+
         <!-- Сводная таблица с ошибками -->
         <div class="failed-checks-table">
             <div class="section-title">
@@ -613,13 +903,15 @@ def save_html_report(all_results):
         status = host_result['status']
         results = host_result.get('results', [])
         
+        passed, failed, total = host_scores[i]
+        
         # Формируем заголовок с статистикой
         if status == 'completed' and results:
-            passed = sum(1 for r in results if r['status'] == 'PASS')
-            total = len(results)
             status_text = f"✅ {passed} из {total} | Машина: {host}"
         elif status == 'failed':
             status_text = f"⚠️ НЕУДАЧНО | Машина: {host}"
+        elif status == 'unreachable':
+            status_text = f"🔌 НЕДОСТУПНА | Машина: {host}"
         else:
             status_text = f"❌ ОШИБКА | Машина: {host}"
         
@@ -631,9 +923,6 @@ def save_html_report(all_results):
 """
         
         if status == 'completed' and results:
-            passed = sum(1 for r in results if r['status'] == 'PASS')
-            failed = sum(1 for r in results if r['status'] == 'FAIL')
-            
             html_content += f"""
             <div style="margin-bottom: 15px;">
                 <strong>Результаты:</strong> PASS: <span style="color: green">{passed}</span>, 
@@ -658,6 +947,8 @@ def save_html_report(all_results):
                     status_class = "status-pass"
                 elif result['status'] == 'FAIL':
                     status_class = "status-fail"
+                elif result['status'] == 'NOT_APPLICABLE':
+                    status_class = "status-na"
                 
                 html_content += f"""
                     <tr>
@@ -722,17 +1013,14 @@ def save_html_report(all_results):
     
     return filename
 
-def get_hosts_from_file(filename):
-    """Чтение IP-адресов из файла (по одному на строку)"""
+def get_hosts_from_file(filename, groups=()):
+    """Инвентарь из файла: машины, подсети, диапазоны и группы (см. src/inventory.py).
+    
+    Возвращает ленивый список машин: len() и обход без развертывания подсетей.
+    """
+    from src.inventory import Inventory
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            hosts = []
-            for line in f:
-                line = line.strip()
-                # Пропускаем пустые строки и комментарии
-                if line and not line.startswith('#'):
-                    hosts.append(line)
-            return hosts
+        return Inventory(filename, groups)
     except FileNotFoundError:
         console.print(f"[red]Файл не найден: {filename}[/red]")
         return []
@@ -740,111 +1028,860 @@ def get_hosts_from_file(filename):
         console.print(f"[red]Ошибка чтения файла {filename}: {e}[/red]")
         return []
 
-def main():
+def audit_host(host, username, password, rules_file, options=None, stats=None):
+    """Аудит одной машины, возвращает запись для сводного отчета"""
+    stats = {} if stats is None else stats
+    group = (options or {}).get('groups', {}).get(host)
+    group_rules = (options or {}).get('group_rules', {}).get(group)
+    if group_rules and group_rules != rules_file:
+        # Свой файл правил группы; эталон проверялся по другим правилам и не сравнивается
+        rules_file = group_rules
+        options = dict(options, golden=None)
+    host_result = _audit_host_result(host, username, password, rules_file, options, stats)
+    if group:
+        host_result['group'] = group
+    if 'drift' in stats:
+        host_result['drift'] = stats['drift']
+    checkpoint = (options or {}).get('checkpoint')
+    if checkpoint is not None:
+        checkpoint.save_host(host_result)
+    return host_result
+
+def _audit_host_result(host, username, password, rules_file, options, stats):
     try:
-        print_banner()
+        with TIMINGS.span('host', host, host):
+            results = run_linux_audit(host, username, password, rules_file, options, stats)
+    except Exception as e:
+        return {
+            "host": host, 
+            "results": [], 
+            "status": "error", 
+            "error": f"Ошибка: {str(e)}"
+        }
+    
+    if not results:
+        return {
+            "host": host, 
+            "results": [], 
+            "status": "failed", 
+            "error": "No results from audit"
+        }
+    
+    passed = sum(1 for r in results if r['status'] == 'PASS')
+    failed = sum(1 for r in results if r['status'] == 'FAIL')
+    return {
+        "host": host, 
+        "results": results, 
+        "status": "completed",
+        "summary": {"passed": passed, "failed": failed}
+    }
+
+def build_baseline(host, username, password, rules_file, options):
+    """Полная проверка эталонной машины с отпечатками входных файлов правил"""
+    from src.drift import Baseline
+    stats = {}
+    host_result = audit_host(host, username, password, rules_file, dict(options, collect_signatures=True), stats)
+    if host_result['status'] != 'completed':
+        return None, host_result
+    return Baseline(host, host_result, stats['signatures']), host_result
+
+def print_drift_summary(all_results, golden_host, limit=10):
+    """Машины и правила, отличающиеся от эталона"""
+    drifted = [r for r in all_results if r.get('drift')]
+    compared = [r for r in all_results if 'drift' in r]
+    console.print(f"\n[bold]📐 ОТКЛОНЕНИЯ ОТ ЭТАЛОНА {golden_host}[/bold]")
+    console.print(f"Совпадают с эталоном: [green]{len(compared) - len(drifted)}[/green] из {len(compared)}")
+    if not drifted:
+        return
+    
+    table = Table(title="Машины с отклонениями", box=ROUNDED)
+    table.add_column("Машина", style="cyan")
+    table.add_column("Правил", justify="right")
+    table.add_column("Правила", style="yellow")
+    for host_result in sorted(drifted, key=lambda r: len(r['drift']), reverse=True)[:limit]:
+        rule_ids = host_result['drift']
+        shown = ', '.join(rule_ids[:5]) + (' ...' if len(rule_ids) > 5 else '')
+        table.add_row(host_result['host'], str(len(rule_ids)), shown)
+    console.print(table)
+    
+    by_rule = {}
+    for host_result in drifted:
+        for rule_id in host_result['drift']:
+            by_rule[rule_id] = by_rule.get(rule_id, 0) + 1
+    table = Table(title="Чаще всего отличаются", box=ROUNDED)
+    table.add_column("Правило", style="yellow")
+    table.add_column("Машин", justify="right")
+    for rule_id, count in sorted(by_rule.items(), key=lambda item: item[1], reverse=True)[:limit]:
+        table.add_row(rule_id, str(count))
+    console.print(table)
+
+def prescan_hosts(hosts, args, checkpoint):
+    """Асинхронный опрос порта SSH: (доступные машины, записи недоступных)"""
+    from src.reachability import scan_hosts, unreachable_result
+    console.print(f"\n[cyan]📡 Опрос доступности {len(hosts)} машин (таймаут {args.prescan_timeout:g} с)...[/cyan]")
+    with TIMINGS.span('prescan', f"{len(hosts)} hosts"):
+        scan = scan_hosts(hosts, args.prescan_timeout, args.prescan_deadline, read_banner=args.prescan_banner)
+    # Машины с неизвестной доступностью (не опрошены к общему сроку, не разрешилось имя) не отбрасываются
+    reachable = [host for host in hosts if scan.get(host, (None,))[0] is not False]
+    unreachable = [unreachable_result(host, scan[host][1]) for host in hosts if scan.get(host, (None,))[0] is False]
+    for host_result in unreachable:
+        # В контрольной точке как неуспешные: --resume попробует их снова
+        checkpoint.save_host(host_result)
+    console.print(f"[green]✓ Доступны: {len(reachable)}[/green]"
+                  + (f", [red]недоступны: {len(unreachable)}[/red]" if unreachable else ""))
+    for host_result in unreachable[:10]:
+        console.print(f"[dim]  {host_result['host']}: {host_result['error']}[/dim]")
+    if len(unreachable) > 10:
+        console.print(f"[dim]  ... и еще {len(unreachable) - 10}[/dim]")
+    return reachable, unreachable
+
+def run_sequential(hosts, username, password, rules_file, options=None):
+    """Последовательная проверка с подробным выводом по каждой машине"""
+    all_results = []
+    for i, host in enumerate(hosts, 1):
+        console.print(f"\n[bold green]🔍 [{i}/{len(hosts)}] Проверка {host}[/bold green]")
+        console.print("[italic]Подключаемся...[/italic]")
         
-        # Запрос списка хостов
-        console.print("[bold cyan]ВВОД СПИСКА МАШИН[/bold cyan]")
-        console.print("[italic]Выберите способ:[/italic]")
-        console.print("1. Ввести IP-адреса вручную (через запятую)")
-        console.print("2. Загрузить из файла (одна строка - один IP/hostname)")
+        host_result = audit_host(host, username, password, rules_file, options)
+        all_results.append(host_result)
         
-        choice = console.input("\n➤ [cyan]Выберите вариант (1 или 2): [/cyan]").strip()
+        if host_result['status'] == 'completed':
+            summary = host_result['summary']
+            console.print(f"[green]✅ Успешно! PASS: {summary['passed']}, FAIL: {summary['failed']}")
+            print_results_table(host, host_result['results'])
+        elif host_result['status'] == 'failed':
+            console.print("[yellow]⚠️  Проверка не дала результатов[/yellow]")
+        else:
+            console.print(f"[red]❌ {host_result['error']}[/red]")
+    return all_results
+
+def run_parallel(hosts, username, password, rules_file, workers, options=None):
+    """Параллельная проверка в пуле потоков с живой панелью хода проверки"""
+    from src.dashboard import SweepDashboard
+    all_results = []
+    # Построчные логи ломают живую панель, оставляем только ошибки
+    logging.getLogger().setLevel(logging.ERROR)
+    
+    with SweepDashboard(console, len(hosts)) as dashboard:
+        def audit_with_progress(host):
+            dashboard.host_started(host)
+            return audit_host(host, username, password, rules_file, options)
         
-        hosts = []
+        def collect(futures):
+            for future in futures:
+                host_result = future.result()
+                dashboard.host_finished(host_result)
+                all_results.append(host_result)
         
-        if choice == "2":
-            # Загрузка из файла
-            filename = console.input("➤ [cyan]Укажите путь к файлу: [/cyan]").strip()
-            if not filename:
-                console.print("[red]❌ Не указан файл![/red]")
-                return
-                
-            hosts = get_hosts_from_file(filename)
-            if not hosts:
-                console.print("[red]❌ Не удалось загрузить адреса из файла[/red]")
-                return
-                
-            console.print(f"[green]✓ Загружено машин из файла: {len(hosts)}[/green]")
-            
+        executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        try:
+            # Машины берутся из списка по мере освобождения потоков: большая подсеть
+            # из инвентаря начинает проверяться сразу и не разворачивается целиком
+            futures = set()
+            for host in hosts:
+                if len(futures) >= max(workers, 1) * 2:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    collect(done)
+                futures.add(executor.submit(audit_with_progress, host))
+            collect(as_completed(futures))
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+    return all_results
+
+def run_processes(hosts, username, password, rules_file, processes, workers, options=None):
+    """Проверка в пуле процессов: в каждом процессе свой пул потоков"""
+    from src.dashboard import SweepDashboard
+    from src.parallel import iter_sharded_results
+    all_results = []
+    logging.getLogger().setLevel(logging.ERROR)
+    
+    events = iter_sharded_results(hosts, audit_host, (username, password, rules_file, options),
+                                  processes, workers)
+    with SweepDashboard(console, len(hosts)) as dashboard:
+        try:
+            for kind, host, host_result in events:
+                if kind == 'started':
+                    dashboard.host_started(host)
+                else:
+                    dashboard.host_finished(host_result)
+                    all_results.append(host_result)
+        finally:
+            events.close()
+    return all_results
+
+def run_continuous(hosts, username, password, rules_file, args, options):
+    """Непрерывная проверка: каждая машина по своему расписанию, без общего пика нагрузки"""
+    import threading
+    from src.scheduler import ContinuousScheduler, FULL, format_duration, parse_duration
+    interval = parse_duration(args.interval)
+    window = parse_duration(args.window) if args.window else interval
+    high_interval = parse_duration(args.high_interval) if args.high_interval else None
+    severities, tags, patterns = options.get('rule_filter') or ((), (), ())
+    if high_interval and severities and 'HIGH' not in severities:
+        console.print("[yellow]⚠️  --high-interval не используется: правила HIGH не выбраны[/yellow]")
+        high_interval = None
+    # Частая проверка - только правила HIGH; в контрольную точку пишутся лишь полные проверки
+    high_options = dict(options, rule_filter=(('HIGH',), tags, patterns), checkpoint=None)
+    
+    def run_audit(host, kind):
+        return audit_host(host, username, password, rules_file, options if kind == FULL else high_options)
+    
+    latest = {}
+    report_lock = threading.Lock()
+    cycle = {'done': 0}
+    
+    def save_cycle_timings():
+        # Замеры - за цикл: иначе при работе неделями они копятся без предела
+        if TIMINGS.enabled:
+            save_timing_report(args.timing_export or ())
+            TIMINGS.drain()
+    
+    def on_result(host_result, kind):
+        stamp = datetime.now().strftime('%H:%M:%S')
+        label = "полная" if kind == FULL else "HIGH"
+        if host_result['status'] == 'completed':
+            summary = host_result['summary']
+            console.print(f"[dim]{stamp}[/dim] [green]✅ {host_result['host']} ({label}): "
+                          f"PASS {summary['passed']}, FAIL {summary['failed']}[/green]")
+        else:
+            console.print(f"[dim]{stamp}[/dim] [red]❌ {host_result['host']} ({label}): "
+                          f"{host_result.get('error', host_result['status'])}[/red]")
+        if kind != FULL:
+            return
+        with report_lock:
+            latest[host_result['host']] = host_result
+            cycle['done'] += 1
+            if cycle['done'] >= len(scheduler.hosts):
+                # Каждая машина проверена полностью еще раз - свежий сводный отчет
+                cycle['done'] = 0
+                save_summary_report(list(latest.values()))
+                save_cycle_timings()
+    
+    scheduler = ContinuousScheduler(hosts, run_audit, interval, window=window, high_interval=high_interval,
+                                    jitter=args.jitter, concurrency=args.workers, on_result=on_result)
+    scheduler.plan()
+    console.print(f"\n[bold cyan]🗓  НЕПРЕРЫВНАЯ ПРОВЕРКА {len(scheduler.hosts)} машин[/bold cyan]")
+    console.print(f"Первая проверка распределена по {format_duration(window)}, "
+                  f"повтор через {format_duration(interval)} ±{args.jitter * 100:g}%"
+                  + (f", правила HIGH - через {format_duration(high_interval)}" if scheduler.high_interval else "")
+                  + f"; одновременно не больше {scheduler.concurrency} машин")
+    for delay, host, kind in scheduler.next_runs():
+        console.print(f"[dim]  через {format_duration(round(delay))}: {host} ({kind})[/dim]")
+    console.print("[dim]Ctrl+C - остановить[/dim]")
+    
+    logging.getLogger().setLevel(logging.ERROR)
+    try:
+        scheduler.run()
+    finally:
+        scheduler.stop()
+        if latest:
+            save_summary_report(list(latest.values()))
+            save_cycle_timings()
+
+def leased_host_settings(options):
+    """Настройки машины для рабочего узла: группа, файл правил и промежуточные узлы группы"""
+    groups = options.get('groups') or {}
+    group_rules = options.get('group_rules') or {}
+    group_bastions = options.get('group_bastions') or {}
+    
+    def host_settings(host):
+        group = groups.get(host)
+        if group is None:
+            return None
+        return {'group': group, 'rules': group_rules.get(group), 'bastions': group_bastions.get(group)}
+    return host_settings
+
+def audit_leased_host(host, username, password, rules_file, options=None, settings=None):
+    """Аудит машины из порции координатора с настройками ее группы из инвентаря координатора"""
+    if settings:
+        group = settings['group']
+        options = dict(options or {}, groups={host: group},
+                       group_rules={group: settings['rules']} if settings.get('rules') else {},
+                       group_bastions={group: settings['bastions']} if settings.get('bastions') else {})
+    return audit_host(host, username, password, rules_file, options)
+
+def run_coordinator(hosts, args, checkpoint=None, options=None):
+    """Раздача машин рабочим узлам и сбор их результатов"""
+    from src.dashboard import SweepDashboard
+    from src.distributed import Coordinator
+    bind_host, _, port = args.serve.rpartition(':')
+    coordinator = Coordinator(hosts, unit_size=args.unit_size, token=args.token,
+                              host_settings=leased_host_settings(options or {}))
+    address = coordinator.serve(bind_host or '0.0.0.0', int(port))
+    console.print(f"[cyan]🛰  Координатор слушает {address[0]}:{address[1]}[/cyan]")
+    console.print(f"[cyan]🔑 Токен для рабочих узлов: [bold]{coordinator.token}[/bold][/cyan]")
+    
+    all_results = []
+    try:
+        with SweepDashboard(console, len(coordinator.hosts)) as dashboard:
+            for host_result in coordinator.iter_results():
+                dashboard.host_finished(host_result)
+                all_results.append(host_result)
+                if checkpoint is not None:
+                    checkpoint.save_host(host_result)
+    finally:
+        # Даем рабочим узлам время получить ответ "работы больше нет"
+        coordinator.shutdown(grace=3)
+    return all_results
+
+def run_worker_mode(args, rules_file, options=None):
+    """Рабочий узел: проверяет машины, выданные координатором"""
+    from src.distributed import run_worker
+    console.print(f"[bold cyan]РАБОЧИЙ УЗЕЛ[/bold cyan] координатора {args.worker}")
+    token = args.token or getpass.getpass("➤ 🔑 Токен координатора: ")
+    username = console.input("➤ [cyan]👤 Имя пользователя: [/cyan]").strip()
+    password = getpass.getpass("➤ 🔒 Пароль: ")
+    if not username or not password:
+        console.print("[red]❌ Не указаны учетные данные![/red]")
+        return
+    
+    def report(host_result):
+        if host_result['status'] == 'completed':
+            summary = host_result['summary']
+            console.print(f"[green]✅ {host_result['host']}: PASS {summary['passed']}, FAIL {summary['failed']}[/green]")
+        else:
+            console.print(f"[red]❌ {host_result['host']}: {host_result.get('error', host_result['status'])}[/red]")
+    
+    logging.getLogger().setLevel(logging.ERROR)
+    run_worker(args.worker, token, audit_leased_host, (username, password, rules_file, options),
+               threads=args.workers, on_result=report)
+    console.print("[green]✓ Координатор сообщил, что работы больше нет[/green]")
+
+def run_daemon(args, rules_file, options):
+    """Служба с HTTP API: правила, кэш вердиктов и SSH-сессии остаются в памяти"""
+    import time
+    from src.service import AuditService, ConnectionPool
+    username, password = ask_credentials()
+    if username is None:
+        return
+    inventory = None
+    if args.inventory:
+        from src.rule_selection import parse_selector
+        inventory = get_hosts_from_file(args.inventory, parse_selector(args.group))
+        if not hasattr(inventory, 'group_rules'):
+            return
+        options.update(groups=inventory, group_rules=inventory.group_rules, group_bastions=inventory.group_bastions)
+    
+    # Разбор правил и отпечаток оценщика - до первого запроса
+    load_rules(rules_file)
+    evaluator_version()
+    pool = ConnectionPool()
+    options['auditor_pool'] = pool
+    logging.getLogger().setLevel(logging.WARNING)
+    # Отчета о замерах у службы нет, а накопленные за недели работы замеры - утечка памяти
+    TIMINGS.configure(enabled=False)
+    
+    service = AuditService(audit_host, (username, password, rules_file, options), workers=max(args.workers, 4),
+                           inventory=inventory, token=args.token)
+    bind_host, _, port = args.daemon.rpartition(':')
+    address = service.serve(bind_host or '127.0.0.1', int(port), pool=pool)
+    console.print(f"[cyan]🛰  Служба проверки слушает {address[0]}:{address[1]}[/cyan]")
+    console.print(f"[cyan]🔑 Токен (заголовок X-Auth-Token): [bold]{service.token}[/bold][/cyan]")
+    console.print("[dim]POST /audits {\"hosts\": [...], \"wait\": true}; Ctrl+C - остановить[/dim]")
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        service.shutdown()
+        pool.close()
+        get_evaluation_cache(options.get('eval_cache'), evaluator_version()).save()
+
+def show_host_tables_on_demand(all_results):
+    """Детальные таблицы по машинам - только по запросу"""
+    by_host = {host_result['host']: host_result for host_result in all_results}
+    while True:
+        host = console.input("\n➤ [cyan]Показать результаты машины (Enter - продолжить): [/cyan]").strip()
+        if not host:
+            return
+        host_result = by_host.get(host)
+        if host_result is None:
+            console.print(f"[red]Машина {host} не проверялась[/red]")
+        elif host_result['status'] != 'completed':
+            console.print(f"[yellow]{host}: {host_result.get('error', host_result['status'])}[/yellow]")
         else:
-            # Ручной ввод (по умолчанию)
-            console.print("[italic]Укажите IP-адреса или hostname через запятую[/italic]")
-            console.print("[italic]Пример: 172.20.36.199, 192.168.1.11, server01.domain.com[/italic]")
+            print_results_table(host, host_result['results'])
+
+def load_summary_report(filename):
+    """Записи машин из сводного JSON-отчета"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [host_result_from_dict(host_result) for host_result in data.get('hosts', [])]
+
+def run_report_command(args):
+    """Статистика и HTML-отчет по сохраненному сводному JSON без повторной проверки"""
+    all_results = load_summary_report(args.summary)
+    matrix = ResultMatrix.from_results(all_results)
+    print_summary_statistics(all_results, matrix)
+    html_filename = save_html_report(all_results, matrix)
+    console.print(f"[green]✓ HTML отчет сохранен: {html_filename}[/green]")
+
+def diff_host_results(old_results, new_results):
+    """Изменения статусов проверок между двумя отчетами: список (машина, правило, было, стало)"""
+    def statuses(host_result):
+        # Повторяющиеся id правил различаем по порядковому номеру
+        seen = {}
+        by_rule = {}
+        for check in host_result.get('results', []):
+            rule_id = check['id']
+            seen[rule_id] = seen.get(rule_id, 0) + 1
+            key = rule_id if seen[rule_id] == 1 else f"{rule_id}#{seen[rule_id]}"
+            by_rule[key] = check['status']
+        return by_rule
+    
+    old_by_host = {host_result['host']: host_result for host_result in old_results}
+    new_by_host = {host_result['host']: host_result for host_result in new_results}
+    changes = []
+    for host in list(dict.fromkeys(list(old_by_host) + list(new_by_host))):
+        old_statuses = statuses(old_by_host.get(host, {}))
+        new_statuses = statuses(new_by_host.get(host, {}))
+        for rule_id in dict.fromkeys(list(old_statuses) + list(new_statuses)):
+            before = old_statuses.get(rule_id, '—')
+            after = new_statuses.get(rule_id, '—')
+            if before != after:
+                changes.append((host, rule_id, before, after))
+    return changes
+
+def run_diff_command(args):
+    """Сравнение двух сводных JSON-отчетов"""
+    changes = diff_host_results(load_summary_report(args.old), load_summary_report(args.new))
+    if not changes:
+        console.print("[green]✓ Результаты проверок не изменились[/green]")
+        return
+    
+    colors = {'PASS': 'green', 'FAIL': 'red', 'ERROR': 'yellow', 'NOT_APPLICABLE': 'dim'}
+    table = Table(title=f"Изменения: {args.old} → {args.new}", box=ROUNDED)
+    table.add_column("Машина", style="cyan")
+    table.add_column("Правило")
+    table.add_column("Было", justify="center")
+    table.add_column("Стало", justify="center")
+    for host, rule_id, before, after in changes:
+        table.add_row(host, rule_id,
+                      f"[{colors.get(before, 'white')}]{before}[/{colors.get(before, 'white')}]",
+                      f"[{colors.get(after, 'white')}]{after}[/{colors.get(after, 'white')}]")
+    console.print(table)
+    fixed = sum(1 for change in changes if change[3] == 'PASS')
+    broken = sum(1 for change in changes if change[3] == 'FAIL')
+    console.print(f"Изменений: {len(changes)}, исправлено: [green]{fixed}[/green], "
+                  f"новых нарушений: [red]{broken}[/red]")
+
+def measure_import_time(runs=3):
+    """Время импорта main.py в отдельном процессе (лучшее из runs) и загруженные тяжелые модули"""
+    code = ("import sys, time; start = time.perf_counter(); import main; "
+            "print((time.perf_counter() - start) * 1000); "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    best, heavy = None, []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed, _, loaded = completed.stdout.partition('\n')
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+        heavy = loaded.split()
+    return best, heavy
+
+def run_import_check(args):
+    """Проверка бюджета времени запуска; код возврата 1 при превышении"""
+    elapsed, heavy = measure_import_time()
+    console.print(f"Импорт main.py: {elapsed:.0f} мс (бюджет {args.budget} мс)")
+    if heavy:
+        console.print(f"[red]❌ При импорте загружены тяжелые модули: {', '.join(heavy)}[/red]")
+    if heavy or elapsed > args.budget:
+        raise SystemExit(1)
+    console.print("[green]✓ Бюджет времени запуска соблюден[/green]")
+
+def jitter_fraction(value):
+    """Тип аргумента --jitter: доля интервала от 0 (включительно) до 1"""
+    try:
+        fraction = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается число, получено {value!r}")
+    # При jitter >= 1 интервал может стать нулевым или отрицательным
+    if not 0 <= fraction < 1:
+        raise argparse.ArgumentTypeError(f"доля должна быть в диапазоне [0, 1), получено {value}")
+    return fraction
+
+
+def parse_args(argv=None):
+    """Параметры командной строки"""
+    parser = argparse.ArgumentParser(description="Compliance Check Tool")
+    subparsers = parser.add_subparsers(dest='command', metavar='КОМАНДА',
+                                       help="Без команды - проверка машин")
+    report_parser = subparsers.add_parser('report', help="Статистика и HTML-отчет по сводному JSON")
+    report_parser.add_argument('summary', help="Файл reports/summary_report_*.json")
+    diff_parser = subparsers.add_parser('diff', help="Сравнение двух сводных JSON-отчетов")
+    diff_parser.add_argument('old', help="Предыдущий отчет")
+    diff_parser.add_argument('new', help="Новый отчет")
+    import_parser = subparsers.add_parser('import-check', help="Проверка бюджета времени запуска")
+    import_parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_MS,
+                               help=f"Допустимое время импорта, мс (по умолчанию {IMPORT_BUDGET_MS})")
+    parser.add_argument(
+        '--timing-export', action='append', choices=['chrome', 'openmetrics'],
+        help="Дополнительно сохранить замеры времени в формате Chrome trace (со всеми интервалами) "
+             "и/или OpenMetrics"
+    )
+    parser.add_argument(
+        '--timing-spans', action='store_true',
+        help="Сохранять в замерах все интервалы, а не только суммы и самые долгие"
+    )
+    parser.add_argument(
+        '--no-timings', action='store_true',
+        help="Не собирать замеры времени"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Количество машин, проверяемых одновременно (по умолчанию 1)"
+    )
+    parser.add_argument(
+        '--processes', type=int, default=1,
+        help="Количество рабочих процессов; в каждом работает --workers потоков"
+    )
+    parser.add_argument(
+        '--collector', action='store_true',
+        help="Собирать данные одним скриптом на машине вместо отдельной команды на каждое правило"
+    )
+    parser.add_argument(
+        '--serve', metavar='HOST:PORT',
+        help="Режим координатора: раздавать машины рабочим узлам по HTTP"
+    )
+    parser.add_argument(
+        '--worker', metavar='URL',
+        help="Режим рабочего узла: брать машины у координатора по адресу URL"
+    )
+    parser.add_argument(
+        '--token',
+        help="Общий токен координатора и рабочих узлов (по умолчанию генерируется координатором)"
+    )
+    parser.add_argument(
+        '--unit-size', type=int, default=10,
+        help="Сколько машин координатор выдает рабочему узлу за раз"
+    )
+    parser.add_argument(
+        '--prescan', action='store_true',
+        help="Перед проверкой асинхронно опросить порт 22 всех машин и не подключаться к недоступным"
+    )
+    parser.add_argument(
+        '--prescan-timeout', type=float, default=3.0, metavar='SECONDS',
+        help="Таймаут опроса доступности одной машины (по умолчанию 3 с)"
+    )
+    parser.add_argument(
+        '--prescan-deadline', type=float, default=None, metavar='SECONDS',
+        help="Общий срок опроса доступности; машины, не опрошенные к нему, проверяются как обычно"
+    )
+    parser.add_argument(
+        '--prescan-banner', action='store_true',
+        help="При опросе доступности дожидаться баннера SSH, а не только открытого порта"
+    )
+    parser.add_argument(
+        '--live', action='store_true',
+        help="Живая панель хода проверки вместо таблиц по каждой машине"
+    )
+    parser.add_argument(
+        '--schedule', action='store_true',
+        help="Непрерывная проверка: машины равномерно распределены по времени, --workers - "
+             "сколько машин проверяется одновременно"
+    )
+    parser.add_argument(
+        '--interval', default='24h', metavar='DURATION',
+        help="Интервал между полными проверками машины в режиме --schedule (по умолчанию 24h)"
+    )
+    parser.add_argument(
+        '--window', metavar='DURATION',
+        help="Окно, по которому распределяются первые проверки (по умолчанию равно --interval)"
+    )
+    parser.add_argument(
+        '--high-interval', metavar='DURATION',
+        help="Более частая проверка только правил HIGH, например 4h"
+    )
+    parser.add_argument(
+        '--jitter', type=jitter_fraction, default=0.1, metavar='FRACTION',
+        help="Случайное отклонение интервалов (доля интервала, по умолчанию 0.1)"
+    )
+    parser.add_argument(
+        '--daemon', metavar='HOST:PORT',
+        help="Режим службы: HTTP/JSON API для запуска проверок, пул SSH-сессий и правила в памяти "
+             "(например, 127.0.0.1:8780)"
+    )
+    parser.add_argument(
+        '--bastion', action='append', metavar='[USER@]HOST[:PORT]',
+        help="Промежуточный узел (jump host); повторить для цепочки. Все проверки идут каналами "
+             "через одно соединение с узлом"
+    )
+    parser.add_argument(
+        '--inventory', metavar='FILE',
+        help="Файл инвентаря: машины, подсети CIDR, диапазоны ws-[001-400] и группы со своими правилами"
+    )
+    parser.add_argument(
+        '--group', metavar='NAME[,NAME]',
+        help="Проверять только указанные группы инвентаря"
+    )
+    parser.add_argument(
+        '--snapshot', action='append', metavar='PATH',
+        help="Проверить снимок файловой системы (каталог или tar) без SSH; "
+             "каталог со снимками - каждый снимок как отдельная машина"
+    )
+    parser.add_argument(
+        '--record', metavar='DIR',
+        help="Сохранять выводы команд каждой машины в каталог DIR для повторной проверки"
+    )
+    parser.add_argument(
+        '--replay', metavar='DIR',
+        help="Проверить машины по записям из каталога DIR без подключения к ним"
+    )
+    parser.add_argument(
+        '--severity', metavar='LEVELS',
+        help="Проверять только правила указанной критичности, например HIGH или HIGH,MEDIUM"
+    )
+    parser.add_argument(
+        '--tags', metavar='TAGS',
+        help="Проверять только правила с тегами (через запятую): явные tags, префикс id "
+             "или подсистема по файлу (pam, ssh, syslog, limits, fly, audit, ...)"
+    )
+    parser.add_argument(
+        '--rules', metavar='PATTERNS',
+        help="Проверять только правила, id которых подходит под шаблоны, например 'pam_faillock_*'"
+    )
+    parser.add_argument(
+        '--resume', metavar='RUN_ID',
+        help="Продолжить прерванный запуск runs/RUN_ID: проверить только непроверенные машины"
+    )
+    parser.add_argument(
+        '--golden', metavar='HOST',
+        help="Эталонная машина: проверяется полностью, на остальных выполняются только "
+             "правила, чьи файлы отличаются от эталона"
+    )
+    parser.add_argument(
+        '--eval-cache', metavar='FILE',
+        help="Файл кэша вердиктов по содержимому вывода команд, общий для запусков"
+    )
+    return parser.parse_args(argv)
+
+def ask_hosts():
+    """Запрос списка машин: вручную или из файла"""
+    console.print("[bold cyan]ВВОД СПИСКА МАШИН[/bold cyan]")
+    console.print("[italic]Выберите способ:[/italic]")
+    console.print("1. Ввести IP-адреса вручную (через запятую)")
+    console.print("2. Загрузить из файла (одна строка - один IP/hostname)")
+    
+    choice = console.input("\n➤ [cyan]Выберите вариант (1 или 2): [/cyan]").strip()
+    
+    hosts = []
+    
+    if choice == "2":
+        # Загрузка из файла
+        filename = console.input("➤ [cyan]Укажите путь к файлу: [/cyan]").strip()
+        if not filename:
+            console.print("[red]❌ Не указан файл![/red]")
+            return []
             
-            hosts_input = console.input("\n➤ [cyan]Машины: [/cyan]").strip()
-            hosts = [host.strip() for host in hosts_input.split(',') if host.strip()]
-        
+        hosts = get_hosts_from_file(filename)
         if not hosts:
-            console.print("[red]❌ Не указано ни одной машины![/red]")
+            console.print("[red]❌ Не удалось загрузить адреса из файла[/red]")
+            return []
+            
+        console.print(f"[green]✓ Загружено машин из файла: {len(hosts)}[/green]")
+        
+    else:
+        # Ручной ввод (по умолчанию)
+        console.print("[italic]Укажите IP-адреса или hostname через запятую[/italic]")
+        console.print("[italic]Пример: 172.20.36.199, 192.168.1.11, server01.domain.com[/italic]")
+        
+        hosts_input = console.input("\n➤ [cyan]Машины: [/cyan]").strip()
+        hosts = [host.strip() for host in hosts_input.split(',') if host.strip()]
+    
+    return hosts
+
+def ask_credentials():
+    """Запрос имени пользователя и пароля"""
+    username = console.input("➤ [cyan]👤 Имя пользователя: [/cyan]").strip()
+    if not username:
+        console.print("[red]❌ Имя пользователя не может быть пустым![/red]")
+        return None, None
+        
+    password = getpass.getpass("➤ 🔒 Пароль: ")
+    if not password:
+        console.print("[red]❌ Пароль не может быть пустым![/red]")
+        return None, None
+    
+    return username, password
+
+SUBCOMMANDS = {
+    'report': run_report_command,
+    'diff': run_diff_command,
+    'import-check': run_import_check,
+}
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command:
+        # Отчеты и проверки без подключения к машинам: без баннера и тяжелых модулей
+        SUBCOMMANDS[args.command](args)
+        return
+    
+    logging.basicConfig(level=logging.INFO)
+    # Все интервалы хранятся только по запросу: без них - суммы и самые долгие
+    TIMINGS.configure(enabled=not args.no_timings,
+                      keep_spans=args.timing_spans or 'chrome' in (args.timing_export or ()))
+    rules_file = "compliance_rules/linux_mtg.yaml"
+    options = {'collector': args.collector, 'record_dir': args.record, 'eval_cache': args.eval_cache,
+               'bastions': args.bastion}
+    try:
+        print_banner()
+        
+        if args.severity or args.tags or args.rules:
+            # Подмножество правил выбирается до подключения к машинам
+            from src.rule_selection import parse_selector
+            options['rule_filter'] = (parse_selector(args.severity, upper=True), parse_selector(args.tags),
+                                      parse_selector(args.rules))
+            selected = len(selected_rules(load_rules(rules_file), options))
+            if not selected:
+                console.print("[red]❌ Ни одно правило не подходит под --severity/--tags/--rules[/red]")
+                return
+            console.print(f"[cyan]📋 Выбрано правил: {selected}[/cyan]")
+        
+        if args.worker:
+            run_worker_mode(args, rules_file, options)
+            return
+        
+        if args.daemon:
+            run_daemon(args, rules_file, options)
             return
         
-        # Запрос учетных данных
+        if args.snapshot:
+            # Снимки файловой системы проверяются локально, без SSH
+            from src.local_auditor import find_snapshots
+            groups = find_snapshots(args.snapshot)
+            options.update(backend='snapshot', groups=groups)
+            hosts = list(groups)
+            console.print(f"[green]✓ Найдено снимков: {len(hosts)}[/green]")
+        elif args.replay:
+            # Повторная проверка по записанным выводам команд
+            options.update(backend='replay', replay_dir=args.replay)
+            hosts = recorded_hosts(args.replay)
+            console.print(f"[green]✓ Найдено записей машин: {len(hosts)}[/green]")
+        elif args.resume:
+            hosts = []
+        elif args.inventory:
+            from src.rule_selection import parse_selector
+            hosts = get_hosts_from_file(args.inventory, parse_selector(args.group))
+        else:
+            hosts = ask_hosts()
+        if hasattr(hosts, 'group_rules'):
+            # Инвентарь сам отвечает на вопрос "в какой группе машина" без словаря по всем машинам
+            options.update(groups=hosts, group_rules=hosts.group_rules, group_bastions=hosts.group_bastions)
+        
+        # Каждая проверенная машина сразу сохраняется в runs/<run-id>
+        previous = {}
+        if args.resume:
+            checkpoint = RunCheckpoint.open(args.resume)
+            previous = checkpoint.load_results()
+            if checkpoint.inventory is not None:
+                options.update(groups=checkpoint.inventory, group_rules=checkpoint.inventory.group_rules,
+                               group_bastions=checkpoint.inventory.group_bastions)
+            else:
+                options.setdefault('groups', {}).update(checkpoint.groups)
+            hosts = checkpoint.pending_hosts(previous)
+            previous = {host: host_result for host, host_result in previous.items()
+                        if host_result['status'] == 'completed' and host != args.golden}
+            console.print(f"[green]✓ Продолжаем запуск {checkpoint.run_id}: проверено {len(previous)}, "
+                          f"осталось {len(hosts)}[/green]")
+        else:
+            if not hosts:
+                console.print("[red]❌ Не указано ни одной машины![/red]")
+                return
+            checkpoint = RunCheckpoint.create(hosts, options.get('groups'))
+        options['checkpoint'] = checkpoint
+        
         console.print(f"\n[cyan]📊 Будет проверено машин: {len(hosts)}[/cyan]")
-        username = console.input("➤ [cyan]👤 Имя пользователя: [/cyan]").strip()
-        if not username:
-            console.print("[red]❌ Имя пользователя не может быть пустым![/red]")
+        console.print(f"[dim]Запуск {checkpoint.run_id}; продолжить после прерывания: "
+                      f"--resume {checkpoint.run_id}[/dim]")
+        
+        if args.serve:
+            # Учетные данные вводятся на рабочих узлах
+            all_results = list(previous.values())
+            if hosts:
+                all_results += run_coordinator(hosts, args, checkpoint, options)
+            show_host_tables_on_demand(all_results)
+            matrix = ResultMatrix.from_results(all_results)
+            print_summary_statistics(all_results, matrix)
+            save_summary_report(all_results, matrix)
             return
-            
-        password = getpass.getpass("➤ 🔒 Пароль: ")
-        if not password:
-            console.print("[red]❌ Пароль не может быть пустым![/red]")
+        
+        if args.snapshot:
+            username, password = '', ''
+        elif args.replay:
+            username, password = '', PASSWORD_PLACEHOLDER
+        else:
+            username, password = ask_credentials()
+            if username is None:
+                return
+        
+        if args.schedule:
+            run_continuous(hosts, username, password, rules_file, args, options)
             return
         
-        rules_file = "compliance_rules/linux_mtg.yaml"
+        unreachable = []
+        if args.prescan and (args.bastion or options.get('group_bastions')):
+            # Машины за промежуточным узлом напрямую не опросить
+            console.print("[yellow]⚠️  Опрос доступности пропущен: машины проверяются через промежуточные узлы[/yellow]")
+        elif args.prescan and not (args.snapshot or args.replay) and hosts:
+            # Выключенные машины не ждут полный таймаут SSH каждая
+            hosts, unreachable = prescan_hosts(hosts, args, checkpoint)
+        
+        golden_result = None
+        if args.golden:
+            # Эталон проверяется полностью, остальные машины сравниваются с ним по хешам файлов
+            console.print(f"\n[bold yellow]📐 Проверка эталона {args.golden}...[/bold yellow]")
+            baseline, golden_result = build_baseline(args.golden, username, password, rules_file, options)
+            if baseline is None:
+                console.print(f"[red]❌ Эталон не проверен: {golden_result.get('error')}[/red]")
+                return
+            options['golden'] = baseline
+            hosts = [host for host in hosts if host != args.golden]
         
         # Обработка всех хостов
-        all_results = []
         console.print(f"\n[bold yellow]🚀 НАЧИНАЕМ ПРОВЕРКУ...[/bold yellow]")
         
-        for i, host in enumerate(hosts, 1):
-            console.print(f"\n[bold green]🔍 [{i}/{len(hosts)}] Проверка {host}[/bold green]")
-            console.print("[italic]Подключаемся...[/italic]")
-            
-            try:
-                results = run_linux_audit(host, username, password, rules_file)
-                
-                if results:
-                    passed = sum(1 for r in results if r['status'] == 'PASS')
-                    failed = sum(1 for r in results if r['status'] == 'FAIL')
-                    
-                    all_results.append({
-                        "host": host, 
-                        "results": results, 
-                        "status": "completed",
-                        "summary": {"passed": passed, "failed": failed}
-                    })
-                    
-                    console.print(f"[green]✅ Успешно! PASS: {passed}, FAIL: {failed}")
-                    print_results_table(host, results)
-                else:
-                    all_results.append({
-                        "host": host, 
-                        "results": [], 
-                        "status": "failed", 
-                        "error": "No results from audit"
-                    })
-                    console.print("[yellow]⚠️  Проверка не дала результатов[/yellow]")
-                    
-            except Exception as e:
-                error_msg = f"Ошибка: {str(e)}"
-                all_results.append({
-                    "host": host, 
-                    "results": [], 
-                    "status": "error", 
-                    "error": error_msg
-                })
-                console.print(f"[red]❌ {error_msg}[/red]")
+        if args.processes > 1:
+            all_results = run_processes(hosts, username, password, rules_file, args.processes, args.workers,
+                                        options)
+            show_host_tables_on_demand(all_results)
+        elif args.workers > 1 or args.live:
+            all_results = run_parallel(hosts, username, password, rules_file, args.workers, options)
+            show_host_tables_on_demand(all_results)
+        else:
+            all_results = run_sequential(hosts, username, password, rules_file, options)
+        
+        # Машины, проверенные до прерывания, и недоступные по предварительному опросу
+        all_results = list(previous.values()) + all_results + unreachable
+        
+        if golden_result is not None:
+            all_results.insert(0, golden_result)
+            print_drift_summary(all_results, args.golden)
         
         # Сводная статистика
-        print_summary_statistics(all_results)
+        matrix = ResultMatrix.from_results(all_results)
+        print_summary_statistics(all_results, matrix)
         
         # Сохранение отчета
-        save_summary_report(all_results)
+        save_summary_report(all_results, matrix)
+        
+        # Где было потрачено время
+        if TIMINGS.enabled:
+            print_timing_table()
+            save_timing_report(args.timing_export or ())
+        
+        # В режиме --processes вердикты считают и сохраняют рабочие процессы
+        eval_cache = get_evaluation_cache(args.eval_cache, evaluator_version())
+        if eval_cache.hits or eval_cache.misses:
+            console.print(f"[dim]Кэш вердиктов: повторно использовано {eval_cache.hits}, "
+                          f"вычислено {eval_cache.misses}[/dim]")
+        eval_cache.save()
             
     except KeyboardInterrupt:
         console.print("\n[yellow]⚠️  Проверка прервана пользователем[/yellow]")
+        if options.get('checkpoint') is not None:
+            console.print(f"[yellow]Продолжить проверку: --resume {options['checkpoint'].run_id}[/yellow]")
     except Exception as e:
         console.print(f"[red]💥 Критическая ошибка: {e}[/red]")
         import traceback
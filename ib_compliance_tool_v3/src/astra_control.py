@@ -0,0 +1,82 @@
+"""Правила типа astra_control: состояние средств защиты Astra Linux.
+
+Правило задает утилиту и действие вместо команды:
+
+  type: "astra_control"
+  check:
+    control: "astra-ptrace-lock"
+    action: "is-enabled"          # или "status", по умолчанию is-enabled
+    expect: "ВКЛЮЧЕНО"            # все слова должны быть в выводе
+
+Отдельно правило выполняется как "echo пароль | sudo -S <утилита> <действие>",
+но перед проверкой машины состояния всех утилит из правил запрашиваются
+одним сценарием под sudo: одна аутентификация вместо десятков. Вывод
+каждой утилиты в сценарии совпадает с выводом ее отдельной команды, поэтому
+кэш оценки и записи работают одинаково в обоих случаях.
+"""
+import logging
+import re
+import shlex
+
+logger = logging.getLogger(__name__)
+
+CONTROL_ACTIONS = ('is-enabled', 'status')
+DEFAULT_ACTION = 'is-enabled'
+_CONTROL_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+_MARKER = '@@ASTRA_CONTROL@@'
+
+
+def control_key(check):
+    """(утилита, действие) из раздела check правила"""
+    control = check['control']
+    action = check.get('action', DEFAULT_ACTION)
+    if not _CONTROL_RE.match(control) or action not in CONTROL_ACTIONS:
+        raise ValueError(f"Неверная проверка astra_control: {control} {action}")
+    return control, action
+
+
+def control_command(control, action):
+    """Отдельная команда утилиты (с местом для пароля)"""
+    return f"echo '{{password}}' | sudo -S {control} {action} 2>/dev/null || echo 'NOT_AVAILABLE'"
+
+
+def build_control_script(keys):
+    """Сценарий sh: вывод каждой утилиты и маркер с кодом возврата"""
+    return '; '.join(
+        f"{control} {action} 2>/dev/null; rc=$?; printf '\\n{_MARKER} %d %d\\n' {index} $rc"
+        for index, (control, action) in enumerate(keys)
+    )
+
+
+def parse_control_output(output, keys):
+    """Вывод сценария в {(утилита, действие): вывод отдельной команды}"""
+    statuses = {}
+    section = []
+    for line in output.splitlines():
+        if not line.startswith(_MARKER):
+            section.append(line)
+            continue
+        _, index, rc = line.split()
+        text = '\n'.join(section).strip()
+        if rc != '0':
+            # Как "|| echo 'NOT_AVAILABLE'" в отдельной команде
+            text = f"{text}\nNOT_AVAILABLE".strip()
+        statuses[keys[int(index)]] = text
+        section = []
+    if not statuses:
+        raise ValueError("нет ни одного ответа (ошибка sudo?)")
+    return statuses
+
+
+def query_controls(auditor, keys, password):
+    """Состояния утилит одной командой под sudo: {(утилита, действие): (output, error)}"""
+    keys = list(dict.fromkeys(keys))
+    script = build_control_script(keys)
+    command = f"echo '{password}' | sudo -S sh -c {shlex.quote(script)}"
+    output, _ = auditor.execute_command(command)
+    statuses = parse_control_output(output, keys)
+    missing = [f"{control} {action}" for control, action in keys if (control, action) not in statuses]
+    if missing:
+        logger.warning(f"Astra control script on {auditor.hostname} did not report: {', '.join(missing)}")
+    # Приглашение sudo в stderr относится ко всему сценарию, а не к отдельным правилам
+    return {key: (text, '') for key, text in statuses.items()}
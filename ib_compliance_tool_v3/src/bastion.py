@@ -0,0 +1,97 @@
+"""Подключение к машинам через промежуточные узлы (bastion, jump host).
+
+На каждый промежуточный узел открывается одно SSH-соединение на процесс;
+до проверяемых машин идут каналы direct-tcpip внутри него, как у
+"ssh -J", но без отдельного процесса и отдельного входа на узел для
+каждой машины. Цепочка из нескольких узлов: каждый следующий узел
+достигается каналом через предыдущий.
+
+Узел задается строкой "[user@]host[:port]"; без user используется имя
+пользователя проверки, пароль - тот же, что для машин.
+"""
+import atexit
+import logging
+import threading
+import time
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+BASTION_PORT = 22
+KEEPALIVE_SECONDS = 30
+# Сколько секунд после неудачного входа на узел не пытаться снова
+FAILURE_TTL = 30
+
+
+def parse_bastion(spec, default_username):
+    """"[user@]host[:port]" в (user, host, port)"""
+    username, _, address = spec.rpartition('@')
+    host, _, port = address.partition(':')
+    return username or default_username, host, int(port) if port else BASTION_PORT
+
+
+class BastionPool:
+    """Открытые соединения с промежуточными узлами, общие для всех потоков процесса"""
+
+    def __init__(self, failure_ttl=FAILURE_TTL):
+        self.failure_ttl = failure_ttl
+        self._clients = {}
+        self._locks = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def transport(self, chain, username, password=None, key_filename=None, timeout=10):
+        """Транспорт последнего узла цепочки; соединения создаются один раз"""
+        transport = None
+        for depth in range(len(chain)):
+            key = (tuple(chain[:depth + 1]), username)
+            with self._lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+            with lock:
+                # Сотни потоков ждут один вход на узел, а не открывают каждый свой
+                client = self._clients.get(key)
+                if client is None or not client.get_transport() or not client.get_transport().is_active():
+                    # Узел недавно не ответил: ждавшие потоки не пробуют по очереди каждый по timeout
+                    failure = self._failures.get(key)
+                    if failure is not None and time.monotonic() < failure[0]:
+                        raise ConnectionError(failure[1])
+                    try:
+                        client = self._connect(chain[depth], transport, username, password, key_filename, timeout)
+                    except Exception as e:
+                        message = f"Промежуточный узел {chain[depth]} недоступен: {e}"
+                        self._failures[key] = (time.monotonic() + self.failure_ttl, message)
+                        raise ConnectionError(message) from e
+                    self._failures.pop(key, None)
+                    self._clients[key] = client
+            transport = client.get_transport()
+        return transport
+
+    def _connect(self, spec, upstream, username, password, key_filename, timeout):
+        user, host, port = parse_bastion(spec, username)
+        sock = open_channel(upstream, host, port) if upstream is not None else None
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(hostname=host, port=port, username=user, password=password,
+                       key_filename=key_filename, timeout=timeout, sock=sock)
+        client.get_transport().set_keepalive(KEEPALIVE_SECONDS)
+        logger.info(f"Connected to bastion {host}:{port}")
+        return client
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            self._locks = {}
+            self._failures = {}
+        # Сначала дальние узлы цепочки: их каналы идут через ближние
+        for key in sorted(clients, key=lambda key: len(key[0]), reverse=True):
+            clients[key].close()
+
+
+def open_channel(transport, host, port=22, timeout=10):
+    """Канал direct-tcpip до host:port через узел"""
+    return transport.open_channel('direct-tcpip', (host, port), ('127.0.0.1', 0), timeout=timeout)
+
+
+BASTIONS = BastionPool()
+atexit.register(BASTIONS.close)
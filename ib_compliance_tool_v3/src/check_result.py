@@ -0,0 +1,165 @@
+"""Компактные записи результатов проверок"""
+import hashlib
+import re
+import sys
+
+# Вывод команды длиннее этого значения обрезается и дополняется хешем полного текста
+MAX_ACTUAL_LENGTH = 2048
+# Строки короче этого значения интернируются: одинаковый вывод на разных хостах хранится один раз
+MAX_INTERN_LENGTH = 4096
+
+_RULE_META = {}
+_TRUNCATED_RE = re.compile(r'\.\.\. \[обрезано, \d+ симв\., sha256:[0-9a-f]{16}\]\Z')
+
+
+class RuleMeta:
+    """Метаданные правила, общие для всех хостов"""
+    __slots__ = ('id', 'name', 'type', 'severity', 'expected')
+
+    def __init__(self, rule_id, name, rule_type, severity, expected):
+        self.id = rule_id
+        self.name = name
+        self.type = rule_type
+        self.severity = severity
+        self.expected = expected
+
+    def __reduce__(self):
+        # При передаче между процессами метаданные снова интернируются
+        return intern_rule_meta, (self.id, self.name, self.type, self.severity, self.expected)
+
+
+def intern_rule_meta(rule_id, name, rule_type='text', severity='MEDIUM', expected=None):
+    """Единственный экземпляр RuleMeta на каждое уникальное правило"""
+    key = (rule_id, name, rule_type, severity, expected)
+    meta = _RULE_META.get(key)
+    if meta is None:
+        meta = _RULE_META[key] = RuleMeta(*key)
+    return meta
+
+
+def rule_meta_from_rule(rule):
+    """RuleMeta для правила из YAML"""
+    return intern_rule_meta(
+        rule['id'],
+        rule['name'],
+        rule.get('type', 'text'),
+        rule.get('severity', 'MEDIUM'),
+        rule.get('check', {}).get('expect'),
+    )
+
+
+def _is_compacted(text, max_length):
+    """Текст уже обрезан compact_text (например, прочитан из JSON-отчета или контрольной точки)"""
+    match = _TRUNCATED_RE.search(text, max_length)
+    return match is not None and match.start() == max_length
+
+
+def compact_text(text, max_length=MAX_ACTUAL_LENGTH):
+    """Обрезка длинного вывода с хешем полного текста и интернирование коротких строк.
+
+    Повторный вызов для уже обрезанного текста его не меняет: иначе при
+    перечитывании отчета длина и хеш в пометке относились бы к обрезку.
+    """
+    if text is None:
+        return None
+    if max_length is not None and len(text) > max_length and not _is_compacted(text, max_length):
+        digest = hashlib.sha256(text.encode('utf-8', 'replace')).hexdigest()[:16]
+        text = f"{text[:max_length]}... [обрезано, {len(text)} симв., sha256:{digest}]"
+    if len(text) <= MAX_INTERN_LENGTH:
+        text = sys.intern(text)
+    return text
+
+
+class CheckResult:
+    """Результат одной проверки на одном хосте.
+
+    Хранит ссылку на общий RuleMeta и только то, что отличается между
+    хостами. Поддерживает доступ как к словарю (result['status'],
+    result.get('actual_display')) для совместимости с отчетами.
+    """
+    __slots__ = ('rule', 'status', 'actual', 'display', 'error')
+
+    _RULE_FIELDS = {'id': 'id', 'name': 'name', 'type': 'type', 'severity': 'severity', 'expected': 'expected'}
+
+    def __init__(self, rule, status, actual=None, display=None, error=None):
+        self.rule = rule
+        self.status = status
+        self.actual = compact_text(actual)
+        # actual_display чаще всего совпадает с actual - тогда не храним его отдельно
+        self.display = None if display == actual else compact_text(display)
+        self.error = compact_text(error) if error else None
+
+    def _field(self, key):
+        attr = self._RULE_FIELDS.get(key)
+        if attr is not None:
+            return getattr(self.rule, attr)
+        if key == 'status':
+            return self.status
+        if key == 'actual':
+            return self.actual
+        if key == 'actual_display':
+            return self.actual if self.display is None else self.display
+        if key == 'error':
+            return self.error
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        value = self._field(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        try:
+            return self._field(key) is not None
+        except KeyError:
+            return False
+
+    def get(self, key, default=None):
+        try:
+            value = self._field(key)
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def to_dict(self):
+        """Представление в виде словаря для JSON-отчетов"""
+        result = {
+            'id': self.rule.id,
+            'name': self.rule.name,
+            'type': self.rule.type,
+            'severity': self.rule.severity,
+            'status': self.status,
+        }
+        if self.actual is not None:
+            result['expected'] = self.rule.expected
+            result['actual'] = self.actual
+            result['actual_display'] = self.get('actual_display')
+        result['error'] = self.error or ''
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстановление записи из JSON-отчета"""
+        rule = intern_rule_meta(
+            data['id'],
+            data.get('name', data['id']),
+            data.get('type', 'text'),
+            data.get('severity', 'MEDIUM'),
+            data.get('expected'),
+        )
+        return cls(rule, data['status'], data.get('actual'), data.get('actual_display'), data.get('error'))
+
+
+def result_to_json(obj):
+    """Хук json.dump для CheckResult"""
+    if isinstance(obj, CheckResult):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def host_result_from_dict(data):
+    """Запись машины из JSON: результаты проверок снова становятся CheckResult"""
+    data = dict(data)
+    data['results'] = [CheckResult.from_dict(check) for check in data.get('results', [])]
+    return data
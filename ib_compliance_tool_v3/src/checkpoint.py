@@ -0,0 +1,93 @@
+"""Контрольные точки обхода парка: каждая проверенная машина сразу на диске.
+
+  runs/<run-id>/run.json          - список машин и групп запуска (или ссылка на инвентарь)
+  runs/<run-id>/hosts/<host>.json - запись машины, как в сводном отчете
+
+Файлы пишутся атомарно (временный файл + os.replace), поэтому прерванный
+запуск оставляет только целые записи. Повторный запуск с --resume <run-id>
+проверяет лишь машины без записи или с неуспешной проверкой.
+"""
+import json
+import os
+from datetime import datetime
+from urllib.parse import quote
+
+from src.check_result import host_result_from_dict, result_to_json
+
+RUNS_DIR = 'runs'
+
+
+def _write_json_atomic(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=result_to_json)
+    os.replace(temp_path, path)
+
+
+class RunCheckpoint:
+    """Каталог одного запуска"""
+
+    def __init__(self, run_id, base_dir=RUNS_DIR):
+        self.run_id = run_id
+        self.directory = os.path.join(base_dir, run_id)
+        self.hosts_directory = os.path.join(self.directory, 'hosts')
+        self.hosts = []
+        self.groups = {}
+        self.inventory = None
+
+    @classmethod
+    def create(cls, hosts, groups=None, base_dir=RUNS_DIR):
+        """Новый запуск со списком машин"""
+        checkpoint = cls(datetime.now().strftime('%Y%m%d_%H%M%S'), base_dir)
+        suffix = 1
+        while os.path.exists(checkpoint.directory):
+            suffix += 1
+            checkpoint = cls(f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{suffix}", base_dir)
+        os.makedirs(checkpoint.hosts_directory)
+        data = {'run_id': checkpoint.run_id, 'created': datetime.now().isoformat(timespec='seconds')}
+        if hasattr(hosts, 'describe'):
+            # Инвентарь с подсетями не разворачиваем: в запуске хранится путь к нему
+            checkpoint.hosts = checkpoint.inventory = hosts
+            data['inventory'] = hosts.describe()
+        else:
+            checkpoint.hosts = data['hosts'] = list(hosts)
+            checkpoint.groups = data['groups'] = dict(groups or {})
+        _write_json_atomic(os.path.join(checkpoint.directory, 'run.json'), data)
+        return checkpoint
+
+    @classmethod
+    def open(cls, run_id, base_dir=RUNS_DIR):
+        """Существующий запуск для продолжения"""
+        checkpoint = cls(run_id, base_dir)
+        with open(os.path.join(checkpoint.directory, 'run.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if 'inventory' in data:
+            from src.inventory import Inventory
+            checkpoint.hosts = checkpoint.inventory = Inventory.from_description(data['inventory'])
+        else:
+            checkpoint.hosts = data.get('hosts', [])
+            checkpoint.groups = data.get('groups', {})
+        return checkpoint
+
+    def save_host(self, host_result):
+        """Запись результата машины; вызывается из потоков и процессов"""
+        path = os.path.join(self.hosts_directory, quote(host_result['host'], safe='') + '.json')
+        _write_json_atomic(path, host_result)
+
+    def load_results(self):
+        """Сохраненные записи машин {host: host_result}"""
+        results = {}
+        for name in sorted(os.listdir(self.hosts_directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.hosts_directory, name), 'r', encoding='utf-8') as f:
+                    host_result = host_result_from_dict(json.load(f))
+            except (OSError, ValueError):
+                continue
+            results[host_result['host']] = host_result
+        return results
+
+    def pending_hosts(self, results):
+        """Машины без записи или с неуспешной проверкой"""
+        return [host for host in self.hosts if results.get(host, {}).get('status') != 'completed']
@@ -0,0 +1,60 @@
+"""Сборщик данных на удаленной машине за один запуск.
+
+Вместо отдельного exec_command на каждое правило на машину по stdin
+передается один POSIX sh скрипт. Он выполняет все команды подряд и
+возвращает один поток: записи вида "<номер> <длина stdout> <длина stderr>\\n"
+с последующими байтами вывода, сжатые gzip (если он есть на машине).
+"""
+import gzip
+import shlex
+
+_SCRIPT_HEADER = r'''set +e
+umask 077
+d=$(mktemp -d 2>/dev/null) || { d="/tmp/.ct.$$"; mkdir -p "$d"; }
+trap 'rm -rf "$d"' EXIT
+if command -v gzip >/dev/null 2>&1; then z='gzip -c'; else z='cat'; fi
+run() {
+  ( eval "$2" ) >"$d/o" 2>"$d/e" </dev/null
+  printf '%s %s %s\n' "$1" "$(wc -c <"$d/o")" "$(wc -c <"$d/e")"
+  cat "$d/o" "$d/e"
+}
+{
+'''
+
+_SCRIPT_FOOTER = '''} | $z
+'''
+
+
+def build_collector_script(commands):
+    """Скрипт, выполняющий команды по порядку и выдающий один поток записей"""
+    lines = [_SCRIPT_HEADER]
+    for index, command in enumerate(commands):
+        lines.append(f"run {index} {shlex.quote(command)}\n")
+    lines.append(_SCRIPT_FOOTER)
+    return ''.join(lines)
+
+
+def parse_collector_blob(data, count):
+    """Разбор потока сборщика в список (output, error) по номерам команд"""
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+
+    outputs = [None] * count
+    position = 0
+    while position < len(data):
+        end = data.index(b'\n', position)
+        index, out_length, err_length = (int(part) for part in data[position:end].split())
+        position = end + 1
+        output = data[position:position + out_length]
+        position += out_length
+        error = data[position:position + err_length]
+        position += err_length
+        outputs[index] = (
+            output.decode('utf-8', 'replace').strip(),
+            error.decode('utf-8', 'replace').strip(),
+        )
+
+    missing = [i for i, item in enumerate(outputs) if item is None]
+    if missing:
+        raise ValueError(f"Collector returned no output for {len(missing)} commands")
+    return outputs
@@ -0,0 +1,98 @@
+"""Живая панель хода проверки для параллельного обхода машин"""
+import threading
+import time
+
+from rich.console import Group
+from rich.live import Live
+from rich.panel import Panel
+from rich.table import Table
+
+
+class SweepDashboard:
+    """Счетчики обхода, скорость, ETA и самые долгие машины в работе.
+
+    Панель перерисовывается с фиксированной частотой, поэтому стоимость
+    вывода в консоль не зависит от размера парка.
+    """
+
+    def __init__(self, console, total_hosts, slowest_limit=5, refresh_per_second=4):
+        self.console = console
+        self.total_hosts = total_hosts
+        self.slowest_limit = slowest_limit
+        self.refresh_per_second = refresh_per_second
+        self.in_flight = {}
+        self.done = 0
+        self.failed = 0
+        self.checks_passed = 0
+        self.checks_failed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._live = None
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        self._live = Live(self, console=self.console, refresh_per_second=self.refresh_per_second,
+                          transient=False)
+        self._live.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._live.__exit__(*exc_info)
+        self._live = None
+
+    def host_started(self, host):
+        with self._lock:
+            self.in_flight[host] = time.monotonic()
+
+    def host_finished(self, host_result):
+        with self._lock:
+            self.in_flight.pop(host_result['host'], None)
+            self.done += 1
+            if host_result['status'] != 'completed':
+                self.failed += 1
+            else:
+                self.checks_passed += host_result['summary']['passed']
+                self.checks_failed += host_result['summary']['failed']
+
+    def __rich__(self):
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self.started
+            in_flight = sorted(self.in_flight.items(), key=lambda item: item[1])
+            done, failed = self.done, self.failed
+            checks_passed, checks_failed = self.checks_passed, self.checks_failed
+
+        remaining = self.total_hosts - done
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = _format_duration(remaining / rate) if rate > 0 else "—"
+
+        stats = Table.grid(padding=(0, 3))
+        for _ in range(6):
+            stats.add_column(justify="center")
+        stats.add_row("Всего", "Готово", "В работе", "Не проверено", "Скорость", "Осталось")
+        stats.add_row(
+            str(self.total_hosts),
+            f"[green]{done}[/green]",
+            f"[cyan]{len(in_flight)}[/cyan]",
+            f"[red]{failed}[/red]",
+            f"{rate * 60:.1f} маш/мин",
+            eta,
+        )
+
+        slowest = Table(title="Самые долгие машины в работе", expand=False)
+        slowest.add_column("Машина", style="cyan")
+        slowest.add_column("Время", justify="right")
+        for host, started in in_flight[:self.slowest_limit]:
+            slowest.add_row(host, _format_duration(now - started))
+
+        footer = (f"Проверок: [green]PASS {checks_passed}[/green] / [red]FAIL {checks_failed}[/red]"
+                  f"   Прошло: {_format_duration(elapsed)}")
+        return Panel(Group(stats, "", slowest, footer), title="[bold yellow]Ход проверки[/bold yellow]",
+                     border_style="blue")
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:d}:{seconds:02d}"
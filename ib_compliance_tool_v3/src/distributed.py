@@ -0,0 +1,356 @@
+"""Координатор и рабочие узлы для проверки парка с нескольких машин.
+
+Координатор делит список машин на порции (work unit) и раздает их
+рабочим узлам по HTTP/JSON. Рабочий узел сам запрашивает порцию,
+проверяет машины своими учетными данными и отправляет результат по
+каждой машине сразу после проверки.
+
+  POST /lease     {worker}               -> {unit, hosts, settings, heartbeat} | {wait} | {done}
+  POST /heartbeat {worker, unit}         -> {hosts, revoke} | {lost}
+  POST /release   {worker, unit, hosts}  -> {ok}
+  POST /result    {worker, unit, result} -> {ok}
+  POST /complete  {worker, unit}         -> {ok}
+
+settings - настройки машин порции из инвентаря координатора: группа,
+файл правил группы и промежуточные узлы.
+
+Если рабочий узел перестал присылать heartbeat, непроверенные машины
+его порции возвращаются в очередь. Освободившийся узел забирает
+половину непроверенных машин у самой большой выданной порции, но не
+сразу: владелец порции получает их в revoke со следующим heartbeat,
+убирает из своей очереди те, что еще не начал проверять, и возвращает
+их через /release. Машины, которые уже проверяются, остаются у него -
+одна машина не проверяется двумя узлами одновременно.
+"""
+import json
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.check_result import host_result_from_dict, result_to_json
+
+
+class WorkUnit:
+    """Порция машин, выданная одному рабочему узлу"""
+    __slots__ = ('unit_id', 'hosts', 'worker', 'deadline', 'revoke')
+
+    def __init__(self, unit_id, hosts):
+        self.unit_id = unit_id
+        self.hosts = list(hosts)
+        self.worker = None
+        self.deadline = 0.0
+        # Машины, которые владелец должен вернуть для другого узла
+        self.revoke = []
+
+
+class Coordinator:
+    """Состояние раздачи работы и прием результатов"""
+
+    def __init__(self, hosts, unit_size=10, lease_timeout=60, token=None, host_settings=None):
+        # Повторы в списке машин проверяем один раз
+        self.hosts = list(dict.fromkeys(hosts))
+        self._host_set = set(self.hosts)
+        self.unit_size = max(unit_size, 1)
+        self.lease_timeout = lease_timeout
+        self.token = token or secrets.token_urlsafe(16)
+        # host -> настройки машины для рабочего узла или None
+        self.host_settings = host_settings
+        self.units = {}
+        self.pending = deque()
+        self.results = {}
+        self.result_queue = queue.Queue()
+        self._next_unit = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+        for i in range(0, len(self.hosts), self.unit_size):
+            self._add_unit(self.hosts[i:i + self.unit_size])
+
+    def _add_unit(self, hosts, front=False):
+        unit = WorkUnit(self._next_unit, hosts)
+        self._next_unit += 1
+        self.units[unit.unit_id] = unit
+        if front:
+            self.pending.appendleft(unit.unit_id)
+        else:
+            self.pending.append(unit.unit_id)
+        return unit
+
+    @property
+    def finished(self):
+        return len(self.results) >= len(self.hosts)
+
+    def _remaining(self, unit):
+        return [host for host in unit.hosts if host not in self.results]
+
+    def _expire_leases(self, now):
+        """Возврат в очередь порций от узлов, переставших отвечать"""
+        for unit in list(self.units.values()):
+            if unit.worker is not None and unit.deadline < now:
+                remaining = self._remaining(unit)
+                del self.units[unit.unit_id]
+                if remaining:
+                    self._add_unit(remaining, front=True)
+
+    def _steal(self):
+        """Попросить самую большую выданную порцию вернуть половину непроверенных машин.
+
+        Сами машины в очередь попадут после /release от ее владельца.
+        """
+        candidates = [(len(self._remaining(u)), u) for u in self.units.values()
+                      if u.worker is not None and not u.revoke]
+        candidates = [(n, u) for n, u in candidates if n >= 2]
+        if not candidates:
+            return
+        _, victim = max(candidates, key=lambda item: item[0])
+        remaining = self._remaining(victim)
+        victim.revoke = remaining[len(remaining) // 2:]
+
+    def lease(self, worker):
+        with self._lock:
+            now = time.monotonic()
+            self._expire_leases(now)
+            if self.finished:
+                return {'done': True}
+
+            unit = None
+            while self.pending and unit is None:
+                unit = self.units.get(self.pending.popleft())
+                if unit is not None and not self._remaining(unit):
+                    del self.units[unit.unit_id]
+                    unit = None
+            if unit is None:
+                self._steal()
+                return {'wait': 1}
+
+            unit.worker = worker
+            unit.deadline = now + self.lease_timeout
+            hosts = self._remaining(unit)
+            return {'unit': unit.unit_id, 'hosts': hosts, 'settings': self._settings(hosts),
+                    'heartbeat': self.lease_timeout / 3}
+
+    def _settings(self, hosts):
+        if self.host_settings is None:
+            return {}
+        settings = {}
+        for host in hosts:
+            host_settings = self.host_settings(host)
+            if host_settings:
+                settings[host] = host_settings
+        return settings
+
+    def heartbeat(self, worker, unit_id):
+        with self._lock:
+            unit = self.units.get(unit_id)
+            if unit is None or unit.worker != worker:
+                return {'lost': True}
+            unit.deadline = time.monotonic() + self.lease_timeout
+            return {'hosts': self._remaining(unit), 'revoke': unit.revoke}
+
+    def release(self, worker, unit_id, hosts):
+        """Владелец порции вернул машины, которые еще не начал проверять"""
+        with self._lock:
+            unit = self.units.get(unit_id)
+            if unit is None or unit.worker != worker:
+                # Порция уже завершена или перераздана: ее машины вернулись в очередь без нас
+                return {'ok': True}
+            released = [host for host in hosts if host in unit.revoke and host not in self.results]
+            unit.revoke = []
+            if released:
+                unit.hosts = [host for host in unit.hosts if host not in released]
+                self._add_unit(released, front=True)
+        return {'ok': True}
+
+    def add_result(self, worker, unit_id, data):
+        host_result = host_result_from_dict(data)
+        with self._lock:
+            host = host_result['host']
+            # Машину могли проверить дважды после перераздачи - берем первый результат
+            if host in self.results or host not in self._host_set:
+                return {'ok': True}
+            self.results[host] = host_result
+            unit = self.units.get(unit_id)
+            if unit is not None and unit.worker == worker:
+                unit.deadline = time.monotonic() + self.lease_timeout
+        self.result_queue.put(host_result)
+        return {'ok': True}
+
+    def complete(self, worker, unit_id):
+        with self._lock:
+            unit = self.units.get(unit_id)
+            if unit is not None and unit.worker == worker:
+                remaining = self._remaining(unit)
+                del self.units[unit.unit_id]
+                if remaining:
+                    self._add_unit(remaining, front=True)
+        return {'ok': True}
+
+    def serve(self, bind_host='0.0.0.0', port=8765):
+        """Запуск HTTP-сервера в фоновом потоке"""
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            routes = {
+                '/lease': lambda body: coordinator.lease(body['worker']),
+                '/heartbeat': lambda body: coordinator.heartbeat(body['worker'], body['unit']),
+                '/release': lambda body: coordinator.release(body['worker'], body['unit'], body['hosts']),
+                '/result': lambda body: coordinator.add_result(body['worker'], body['unit'], body['result']),
+                '/complete': lambda body: coordinator.complete(body['worker'], body['unit']),
+            }
+
+            def do_POST(self):
+                route = self.routes.get(self.path)
+                if route is None:
+                    self.send_error(404)
+                    return
+                if not secrets.compare_digest(self.headers.get('X-Auth-Token', ''), coordinator.token):
+                    self.send_error(403)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                    payload = json.dumps(route(body), ensure_ascii=False).encode('utf-8')
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((bind_host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def iter_results(self):
+        """Результаты по машинам по мере поступления от рабочих узлов"""
+        received = 0
+        while received < len(self.hosts):
+            yield self.result_queue.get()
+            received += 1
+
+    def shutdown(self, grace=None):
+        """Остановка сервера; grace - сколько ждать, чтобы узлы успели получить done"""
+        if self._server is None:
+            return
+        if grace:
+            time.sleep(grace)
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+
+class CoordinatorClient:
+    """HTTP-клиент рабочего узла"""
+
+    def __init__(self, url, token, timeout=30):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def call(self, path, body):
+        data = json.dumps(body, ensure_ascii=False, default=result_to_json).encode('utf-8')
+        request = urllib.request.Request(
+            self.url + path, data=data, method='POST',
+            headers={'Content-Type': 'application/json', 'X-Auth-Token': self.token},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+def run_worker(url, token, audit_func, audit_args, threads=4, worker_id=None, on_result=None):
+    """Цикл рабочего узла: брать порции у координатора, пока работа не кончится"""
+    client = CoordinatorClient(url, token)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    failures = 0
+    while True:
+        try:
+            lease = client.call('/lease', {'worker': worker_id})
+        except (OSError, ValueError):
+            # Координатор временно недоступен или уже завершил работу
+            failures += 1
+            if failures >= 5:
+                return
+            time.sleep(2)
+            continue
+        failures = 0
+        if lease.get('done'):
+            return
+        if 'wait' in lease:
+            time.sleep(lease['wait'])
+            continue
+
+        unit_id = lease['unit']
+        local = deque(lease['hosts'])
+        settings = lease.get('settings') or {}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def heartbeat_loop():
+            while not stop.wait(lease['heartbeat']):
+                try:
+                    reply = client.call('/heartbeat', {'worker': worker_id, 'unit': unit_id})
+                except (OSError, ValueError):
+                    # Нет связи или испорченный ответ: аренду продлит следующий heartbeat
+                    continue
+                with lock:
+                    if reply.get('lost'):
+                        local.clear()
+                        continue
+                    # Машины, проверенные или перерозданные координатором
+                    keep = set(reply.get('hosts', []))
+                    for host in [h for h in local if h not in keep]:
+                        local.remove(host)
+                    # Возвращаем только еще не начатые машины: начатые проверит этот узел
+                    released = [host for host in reply.get('revoke', []) if host in local]
+                    for host in released:
+                        local.remove(host)
+                if reply.get('revoke'):
+                    try:
+                        client.call('/release', {'worker': worker_id, 'unit': unit_id, 'hosts': released})
+                    except (OSError, ValueError):
+                        # Координатор не получил машины: они вернутся в очередь после /complete
+                        pass
+
+        def audit_loop():
+            while True:
+                with lock:
+                    if not local:
+                        return
+                    host = local.popleft()
+                if host in settings:
+                    host_result = audit_func(host, *audit_args, settings=settings[host])
+                else:
+                    host_result = audit_func(host, *audit_args)
+                try:
+                    client.call('/result', {'worker': worker_id, 'unit': unit_id, 'result': host_result})
+                except (OSError, ValueError):
+                    # Координатор перераздаст машину после истечения аренды
+                    pass
+                if on_result is not None:
+                    on_result(host_result)
+
+        heartbeat = threading.Thread(target=heartbeat_loop, daemon=True)
+        heartbeat.start()
+        auditors = [threading.Thread(target=audit_loop, daemon=True) for _ in range(max(threads, 1))]
+        for auditor in auditors:
+            auditor.start()
+        for auditor in auditors:
+            auditor.join()
+        stop.set()
+        try:
+            client.call('/complete', {'worker': worker_id, 'unit': unit_id})
+        except (OSError, ValueError):
+            pass
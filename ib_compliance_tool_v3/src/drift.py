@@ -0,0 +1,79 @@
+"""Поиск отклонений парка от эталонной машины.
+
+Эталон проверяется полностью, и для каждого правила запоминается хеш его
+входных файлов. С остальных машин сначала собираются только хеши - одним
+вызовом sha256sum. Правила, чьи файлы совпадают с эталоном, получают
+результат эталона; заново выполняются только правила с отличающимися
+файлами и правила, зависящие не только от файлов (systemctl, astra-*).
+"""
+import fnmatch
+import shlex
+
+from src.local_auditor import SNAPSHOT_COMMANDS, command_paths, command_programs, strip_sudo
+
+_GLOB_CHARS = '*?['
+
+
+def rule_input_paths(command):
+    """Файлы, от которых зависит вывод команды, или None, если вывод зависит не только от файлов"""
+    command = strip_sudo(command)
+    programs = command_programs(command)
+    if not programs or any(program not in SNAPSHOT_COMMANDS for program in programs):
+        return None
+    paths = tuple(dict.fromkeys(command_paths(command)))
+    return paths or None
+
+
+def hash_command(paths, password):
+    """Одна команда, считающая sha256 всех входных файлов"""
+    arguments = ' '.join(path if any(ch in path for ch in _GLOB_CHARS) else shlex.quote(path)
+                         for path in sorted(paths))
+    return f"echo '{password}' | sudo -S sha256sum -- {arguments} 2>/dev/null"
+
+
+def parse_hashes(output):
+    """Вывод sha256sum в словарь {путь: хеш}"""
+    hashes = {}
+    for line in output.splitlines():
+        digest, _, path = line.partition('  ')
+        if path:
+            hashes[path.lstrip('*')] = digest
+    return hashes
+
+
+def input_signature(paths, hashes):
+    """Хеши файлов правила; отсутствующий файл тоже часть отпечатка"""
+    signature = []
+    for pattern in paths:
+        if any(ch in pattern for ch in _GLOB_CHARS):
+            signature.extend((path, digest) for path, digest in sorted(hashes.items())
+                             if fnmatch.fnmatchcase(path, pattern))
+        else:
+            signature.append((pattern, hashes.get(pattern)))
+    return tuple(signature)
+
+
+class Baseline:
+    """Результаты эталонной машины и отпечатки входных файлов ее правил"""
+
+    def __init__(self, host, host_result, signatures):
+        self.host = host
+        self.host_result = host_result
+        # Порядок совпадает с порядком правил в YAML (в нем есть повторяющиеся id)
+        self.results = host_result['results']
+        self.signatures = signatures
+
+    def reusable(self, index, signature):
+        return (index < len(self.signatures) and signature is not None
+                and self.signatures[index] == signature)
+
+
+def collect_signatures(auditor, commands, password):
+    """Отпечатки входных файлов для списка команд правил за один вызов sha256sum"""
+    rule_paths = [rule_input_paths(command) if command else None for command in commands]
+    all_paths = {path for paths in rule_paths if paths for path in paths}
+    if not all_paths:
+        return [None] * len(commands)
+    output, _ = auditor.execute_command(hash_command(all_paths, password))
+    hashes = parse_hashes(output)
+    return [input_signature(paths, hashes) if paths else None for paths in rule_paths]
@@ -0,0 +1,147 @@
+"""Кэш оценки правил по содержимому вывода команды.
+
+Ключ - sha256 от правила (id, тип, ожидаемое значение), версии оценщика
+и вывода команды. Машины с одинаковыми файлами конфигурации получают
+готовый вердикт, и число оценок растет с числом различных конфигураций,
+а не с числом машин. Кэш можно сохранить в файл и использовать между
+запусками.
+
+Хранится только вердикт: статус и actual_display, обрезанный так же, как
+в CheckResult; actual_display, совпадающий с выводом, не хранится вовсе.
+Сам вывод команды в кэш не попадает, а число записей ограничено
+max_entries - при переполнении вытесняются самые старые.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: без блокировки, как раньше
+    fcntl = None
+
+from src.check_result import compact_text
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 2
+MAX_ENTRIES = 50000
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+class EvaluationCache:
+    """Потокобезопасный словарь {ключ: (status, actual_display или None)}"""
+
+    def __init__(self, path=None, salt='', max_entries=MAX_ENTRIES):
+        self.path = path
+        self.salt = salt
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._saved_misses = 0
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def key(self, rule_meta, output):
+        digest = hashlib.sha256()
+        digest.update(f"{self.salt}\0{rule_meta.id}\0{rule_meta.type}\0{rule_meta.expected!r}\0".encode('utf-8'))
+        digest.update(output.encode('utf-8', 'replace'))
+        return digest.hexdigest()
+
+    def evaluate(self, rule_meta, output, evaluate_func):
+        """Вердикт из кэша или evaluate_func(type, expected, output) с сохранением"""
+        key = self.key(rule_meta, output)
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.hits += 1
+            status, display = cached
+            return status, output if display is None else display
+        status, display = evaluate_func(rule_meta.type, rule_meta.expected, output)
+        with self._lock:
+            self.misses += 1
+            self.entries[key] = (status, None if display == output else compact_text(display))
+            if len(self.entries) > self.max_entries:
+                # Словарь хранит порядок добавления: первая запись - самая старая
+                del self.entries[next(iter(self.entries))]
+        return status, display
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Evaluation cache {self.path} is unreadable, starting empty: {e}")
+            return
+        # Кэш другой версии оценщика не используем
+        if data.get('format') != CACHE_FORMAT or data.get('salt') != self.salt:
+            return
+        entries = list(data.get('entries', {}).items())[-self.max_entries:]
+        self.entries.update((key, tuple(value)) for key, value in entries)
+
+    def save(self):
+        """Атомарное сохранение, если появились новые вердикты"""
+        if not self.path or self.misses == self._saved_misses:
+            return
+        with self._lock:
+            entries = dict(self.entries)
+            misses = self.misses
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Рабочие процессы сохраняют кэш одновременно: чтение, слияние и запись - под блокировкой файла
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Вердикты, сохраненные за это время другими процессами, не теряем
+            on_disk = EvaluationCache(self.path, self.salt, self.max_entries).entries
+            on_disk.update(entries)
+            on_disk = dict(list(on_disk.items())[-self.max_entries:])
+            self._write({'format': CACHE_FORMAT, 'salt': self.salt, 'entries': on_disk})
+        self._saved_misses = misses
+
+    def _write(self, data):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            # Недописанный временный файл не оставляем рядом с кэшем
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+def get_evaluation_cache(path=None, salt=''):
+    """Один кэш на процесс для каждого файла (None - только в памяти)"""
+    with _CACHES_LOCK:
+        cache = _CACHES.get((path, salt))
+        if cache is None:
+            cache = _CACHES[path, salt] = EvaluationCache(path, salt)
+            if path:
+                atexit.register(cache.save)
+        return cache
+
+
+def save_evaluation_caches():
+    """Сохранение всех файловых кэшей процесса.
+
+    Рабочий процесс вызывает ее явно до последнего события родителю:
+    после него родитель может завершить процесс, не дождавшись atexit.
+    """
+    with _CACHES_LOCK:
+        caches = list(_CACHES.values())
+    for cache in caches:
+        try:
+            cache.save()
+        except OSError as e:
+            logger.warning(f"Failed to save evaluation cache {cache.path}: {e}")
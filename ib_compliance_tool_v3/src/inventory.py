@@ -0,0 +1,258 @@
+"""Инвентарь машин: подсети, диапазоны и группы без развертывания списка.
+
+Формат файла (по строке на шаблон, # - комментарий):
+
+  172.20.1.5                      # отдельная машина без группы
+  [бухгалтерия]                   # группа
+  rules = compliance_rules/linux.yaml   # свой файл правил группы
+  bastion = admin@jump.buh.local        # промежуточные узлы группы через запятую
+  172.20.36.0/22                  # подсеть: все адреса машин
+  10.1.1.10-10.1.1.50             # диапазон адресов
+  10.1.2.10-50                    # диапазон в последнем октете
+  ws-[001-400].buh.local          # числовой диапазон в имени (с нулями)
+  srv-[1,3,7-9].buh.local         # перечисление
+
+Машины выдаются генератором по мере обхода, число машин считается
+арифметически: проверка большой подсети начинается сразу, а список
+адресов в памяти не строится.
+"""
+import ipaddress
+import os
+import re
+
+_BRACKET_RE = re.compile(r'\[([0-9,\-]+)\]')
+_SETTING_RE = re.compile(r'^([A-Za-z_]+)\s*=\s*(.+)$')
+GROUP_SETTINGS = ('rules', 'bastion')
+
+
+class _Single:
+    """Одна машина"""
+
+    def __init__(self, host):
+        self.host = host
+
+    def __iter__(self):
+        yield self.host
+
+    def __len__(self):
+        return 1
+
+    def __contains__(self, host):
+        return host == self.host
+
+
+class _Network:
+    """Подсеть в нотации CIDR: адреса машин без адреса сети и широковещательного"""
+
+    def __init__(self, text):
+        self.network = ipaddress.ip_network(text, strict=False)
+
+    def __iter__(self):
+        return (str(address) for address in self.network.hosts())
+
+    def __len__(self):
+        if self.network.num_addresses <= 2:
+            return self.network.num_addresses
+        return self.network.num_addresses - (2 if self.network.version == 4 else 1)
+
+    def __contains__(self, host):
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        if address not in self.network:
+            return False
+        if self.network.num_addresses <= 2:
+            return True
+        if address == self.network.network_address:
+            return False
+        return self.network.version == 6 or address != self.network.broadcast_address
+
+
+class _AddressRange:
+    """Диапазон адресов "первый-последний" включительно"""
+
+    def __init__(self, first, last):
+        self.first = ipaddress.ip_address(first)
+        self.last = ipaddress.ip_address(last)
+        if self.first.version != self.last.version or self.last < self.first:
+            raise ValueError(f"Неверный диапазон адресов: {first}-{last}")
+
+    def __iter__(self):
+        return (str(ipaddress.ip_address(value)) for value in range(int(self.first), int(self.last) + 1))
+
+    def __len__(self):
+        return int(self.last) - int(self.first) + 1
+
+    def __contains__(self, host):
+        try:
+            return self.first <= ipaddress.ip_address(host) <= self.last
+        except (ValueError, TypeError):
+            return False
+
+
+class _NamePattern:
+    """Имя с числовыми диапазонами в квадратных скобках"""
+
+    def __init__(self, text):
+        self.parts = []
+        position = 0
+        for match in _BRACKET_RE.finditer(text):
+            self.parts.append([text[position:match.start()]])
+            self.parts.append(_expand_bracket(match.group(1)))
+            position = match.end()
+        self.parts.append([text[position:]])
+        self.regex = re.compile(''.join(
+            re.escape(part[0]) if index % 2 == 0 else r'(\d+)' for index, part in enumerate(self.parts)
+        ))
+
+    def __iter__(self):
+        # Не itertools.product: он заранее строит кортежи всех значений
+        return self._expand(0, '')
+
+    def _expand(self, index, prefix):
+        if index == len(self.parts):
+            yield prefix
+            return
+        for value in self.parts[index]:
+            yield from self._expand(index + 1, prefix + value)
+
+    def __len__(self):
+        size = 1
+        for part in self.parts:
+            size *= len(part)
+        return size
+
+    def __contains__(self, host):
+        match = self.regex.fullmatch(host)
+        if not match:
+            return False
+        return all(value in part for value, part in zip(match.groups(), self.parts[1::2]))
+
+
+class _Numbers:
+    """Значения одной пары скобок: "001-400" или "1,3,7-9"; ленивый список строк"""
+
+    def __init__(self, ranges):
+        self.ranges = ranges
+
+    def __iter__(self):
+        for first, last, width in self.ranges:
+            for value in range(first, last + 1):
+                yield str(value).zfill(width)
+
+    def __len__(self):
+        return sum(last - first + 1 for first, last, _ in self.ranges)
+
+    def __contains__(self, text):
+        value = int(text)
+        return any(first <= value <= last and text == str(value).zfill(width) for first, last, width in self.ranges)
+
+
+def _expand_bracket(text):
+    ranges = []
+    for item in text.split(','):
+        first, _, last = item.partition('-')
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"Неверный диапазон в скобках: [{text}]")
+        last = last or first
+        # Ширина с ведущими нулями задается первым числом: 001-400 -> 001, 002, ...
+        width = len(first) if first.startswith('0') and len(first) > 1 else 0
+        if int(last) < int(first):
+            raise ValueError(f"Неверный диапазон в скобках: [{text}]")
+        ranges.append((int(first), int(last), width))
+    return _Numbers(ranges)
+
+
+def parse_pattern(text):
+    """Шаблон строки инвентаря: объект с __iter__, __len__ и __contains__"""
+    if '[' in text:
+        return _NamePattern(text)
+    if '/' in text:
+        return _Network(text)
+    if '-' in text:
+        first, _, last = text.partition('-')
+        try:
+            first_address = ipaddress.ip_address(first)
+        except ValueError:
+            # Имя машины с дефисом
+            return _Single(text)
+        if first_address.version == 4 and last.isdigit():
+            last = '.'.join(first.split('.')[:3] + [last])
+        return _AddressRange(first, last)
+    return _Single(text)
+
+
+class Inventory:
+    """Файл инвентаря: ленивый список машин с группами.
+
+    Поддерживает len() и итерацию, как список машин, и get(host) -
+    группу машины, как словарь групп.
+    """
+
+    def __init__(self, path, groups=()):
+        self.path = path
+        self.selected_groups = tuple(groups)
+        self.entries = []
+        self.group_rules = {}
+        self.group_bastions = {}
+        self._load()
+
+    def _load(self):
+        group = None
+        known_groups = set()
+        base_dir = os.path.dirname(os.path.abspath(self.path))
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                if line.startswith('[') and line.endswith(']') and not _BRACKET_RE.fullmatch(line):
+                    group = line[1:-1].strip()
+                    known_groups.add(group)
+                    continue
+                setting = _SETTING_RE.match(line)
+                if setting:
+                    key, value = setting.groups()
+                    if group is None or key not in GROUP_SETTINGS:
+                        raise ValueError(f"{self.path}:{number}: неизвестная настройка {key}")
+                    if key == 'rules':
+                        # Относительный путь - от текущего каталога, если файл там есть, иначе от инвентаря
+                        value = value.strip()
+                        if not os.path.exists(value) and not os.path.isabs(value):
+                            value = os.path.join(base_dir, value)
+                        self.group_rules[group] = value
+                    elif key == 'bastion':
+                        self.group_bastions[group] = [item.strip() for item in value.split(',') if item.strip()]
+                    continue
+                try:
+                    pattern = parse_pattern(line)
+                except ValueError as e:
+                    raise ValueError(f"{self.path}:{number}: {e}") from None
+                if not self.selected_groups or group in self.selected_groups:
+                    self.entries.append((pattern, group))
+        unknown = [name for name in self.selected_groups if name not in known_groups]
+        if unknown:
+            raise ValueError(f"{self.path}: нет групп: {', '.join(unknown)}")
+
+    def __iter__(self):
+        for pattern, _ in self.entries:
+            yield from pattern
+
+    def __len__(self):
+        return sum(len(pattern) for pattern, _ in self.entries)
+
+    def get(self, host, default=None):
+        """Группа машины: первая строка инвентаря, под которую она подходит"""
+        for pattern, group in self.entries:
+            if group is not None and host in pattern:
+                return group
+        return default
+
+    def describe(self):
+        """Описание для контрольной точки запуска"""
+        return {'path': os.path.abspath(self.path), 'groups': list(self.selected_groups)}
+
+    @classmethod
+    def from_description(cls, description):
+        return cls(description['path'], description.get('groups', ()))
@@ -0,0 +1,119 @@
+"""Правила типа limits: действующие ограничения pam_limits.
+
+Все файлы limits.conf и limits.d/*.conf читаются одной командой (общей для
+всех правил типа limits, поэтому на машине она выполняется один раз), а
+итоговые значения вычисляются локально с порядком применения pam_limits:
+
+- сначала limits.conf, затем файлы limits.d в порядке имен ("C" locale);
+- при одинаковом домене более поздняя запись заменяет раннюю;
+- запись для пользователя важнее записи для @группы, а та важнее "*";
+- тип "-" задает и hard, и soft.
+
+Ожидаемое значение правила: "[домен] тип параметр [оператор] значение",
+например "hard fsize 50000000" или "* soft nofile >= 1024". Оператор:
+=, <= или >= (по умолчанию =). unlimited и -1 больше любого числа.
+"""
+import functools
+import re
+
+LIMITS_COMMAND = "grep -H '' /etc/security/limits.conf.bak /etc/security/limits.d/*.conf.bak 2>/dev/null"
+
+UNLIMITED_VALUES = ('unlimited', 'infinity', '-1')
+_OPERATORS = ('=', '<=', '>=')
+_LINE_RE = re.compile(r'^(?P<file>[^:]*):(?P<line>.*)$')
+
+
+def _domain_rank(domain):
+    """Чем меньше, тем важнее домен (как LIMITS_DEF_* в pam_limits)"""
+    if domain == '*':
+        return 3
+    if domain.startswith('%'):
+        return 2
+    if domain.startswith('@'):
+        return 1
+    return 0
+
+
+@functools.lru_cache(maxsize=64)
+def parse_limits(output):
+    """Вывод LIMITS_COMMAND в словарь {(домен, тип, параметр): (значение, файл)}"""
+    limits = {}
+    for raw_line in output.splitlines():
+        match = _LINE_RE.match(raw_line)
+        if not match:
+            continue
+        line = match.group('line').split('#', 1)[0].split()
+        if len(line) == 3:
+            # Строка без домена ("hard fsize 0") действует для всех
+            line.insert(0, '*')
+        if len(line) != 4:
+            continue
+        domain, limit_type, item, value = line
+        types = ('hard', 'soft') if limit_type == '-' else (limit_type,)
+        for single_type in types:
+            limits[domain, single_type, item] = (value, match.group('file'))
+    return limits
+
+
+def effective_limit(limits, domain, limit_type, item):
+    """Действующее значение для домена: самая конкретная из применимых записей"""
+    candidates = [(_domain_rank(entry_domain), entry_domain)
+                  for entry_domain, entry_type, entry_item in limits
+                  if entry_type == limit_type and entry_item == item
+                  and (entry_domain == domain or entry_domain == '*')]
+    if not candidates:
+        return None
+    _, best_domain = min(candidates)
+    return limits[best_domain, limit_type, item]
+
+
+def parse_expected(expected):
+    """Разбор ожидаемого значения в (домен, тип, параметр, оператор, значение)"""
+    parts = expected.split()
+    if len(parts) >= 2 and parts[-2] in _OPERATORS:
+        operator = parts.pop(-2)
+    else:
+        operator = '='
+    if len(parts) == 3:
+        parts.insert(0, '*')
+    if len(parts) != 4:
+        raise ValueError(f"Неверное ожидаемое значение limits: {expected}")
+    domain, limit_type, item, value = parts
+    return domain, limit_type, item, operator, value
+
+
+def _numeric(value):
+    if value.lower() in UNLIMITED_VALUES:
+        return float('inf')
+    return int(value)
+
+
+def compare_limit(actual, operator, expected):
+    try:
+        actual_value, expected_value = _numeric(actual), _numeric(expected)
+    except ValueError:
+        # Нечисловые параметры (например, priority) сравниваем как строки
+        return operator == '=' and actual == expected
+    if operator == '<=':
+        return actual_value <= expected_value
+    if operator == '>=':
+        return actual_value >= expected_value
+    return actual_value == expected_value
+
+
+def evaluate_limits(expected, output):
+    """Оценка правила limits, возвращает (status, actual_display)"""
+    try:
+        domain, limit_type, item, operator, value = parse_expected(expected)
+    except ValueError as e:
+        return "ERROR", str(e)
+    found = effective_limit(parse_limits(output), domain, limit_type, item)
+    if found is None:
+        return "FAIL", f"NOT_FOUND: {domain} {limit_type} {item}"
+    actual, source = found
+    status = "PASS" if compare_limit(actual, operator, value) else "FAIL"
+    return status, f"{limit_type} {item} {actual} ({source})"
+
+
+# Функции оценки для отпечатка evaluator_version в main.py
+LIMITS_EVALUATORS = (parse_limits.__wrapped__, effective_limit, parse_expected, compare_limit, evaluate_limits)
@@ -1,55 +1,100 @@
 import paramiko
 import logging
+import time
+from src.timing import TIMINGS
+from src.collector import build_collector_script, parse_collector_blob
 
-# Настраиваем логирование, чтобы видеть что происходит
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class LinuxAuditor:
-    def __init__(self, hostname, username, password=None, key_filename=None):
+    def __init__(self, hostname, username, password=None, key_filename=None, bastions=None):
         self.hostname = hostname
         self.username = username
         self.password = password
         self.key_filename = key_filename
+        # Цепочка промежуточных узлов "[user@]host[:port]" (см. src/bastion.py)
+        self.bastions = list(bastions or [])
         self.client = None
 
     def connect(self):
         """Установка SSH соединения"""
+        start = time.perf_counter()
         try:
             self.client = paramiko.SSHClient()
             # Автоматически добавляем хост в известные (осторожно в production!)
             self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             
+            sock = None
+            if self.bastions:
+                # Канал через общее соединение с промежуточным узлом
+                from src.bastion import BASTIONS, open_channel
+                transport = BASTIONS.transport(self.bastions, self.username, self.password, self.key_filename)
+                sock = open_channel(transport, self.hostname)
+            
             self.client.connect(
                 hostname=self.hostname,
                 username=self.username,
                 password=self.password,
                 key_filename=self.key_filename,
-                timeout=10
+                timeout=10,
+                sock=sock
             )
             logger.info(f"Successfully connected to {self.hostname}")
             return True
         except Exception as e:
             logger.error(f"Connection failed to {self.hostname}: {str(e)}")
             return False
+        finally:
+            # TCP, обмен ключами и аутентификация paramiko выполняет одним вызовом
+            TIMINGS.add('connect', self.hostname, self.hostname, start, time.perf_counter() - start)
 
     def execute_command(self, command):
         """Выполнение команды на удаленной машине"""
         if not self.client:
             raise Exception("Not connected to host")
         
+        start = time.perf_counter()
         try:
             stdin, stdout, stderr = self.client.exec_command(command)
             output = stdout.read().decode('utf-8').strip()
             error = stderr.read().decode('utf-8').strip()
             
             if error:
-                logger.warning(f"Command '{command}' returned error: {error}")
+                logger.warning(f"Command '{self._mask_password(command)}' returned error: {error}")
             
             return output, error
         except Exception as e:
             logger.error(f"Command execution failed: {str(e)}")
             return "", str(e)
+        finally:
+            TIMINGS.add('command', self._mask_password(command), self.hostname, start, time.perf_counter() - start)
+
+    def run_collector(self, commands):
+        """Выполнение всех команд одним скриптом, возвращает список (output, error)"""
+        if not self.client:
+            raise Exception("Not connected to host")
+        
+        with TIMINGS.span('collector', f"{len(commands)} commands", self.hostname):
+            script = build_collector_script(commands)
+            stdin, stdout, stderr = self.client.exec_command('sh -s')
+            stdin.write(script.encode('utf-8'))
+            stdin.channel.shutdown_write()
+            blob = stdout.read()
+            error = stderr.read().decode('utf-8', 'replace').strip()
+            if error:
+                logger.warning(f"Collector on {self.hostname} returned error: {error}")
+            return parse_collector_blob(blob, len(commands))
+
+    def _mask_password(self, command):
+        """Команда без пароля - для логов и замеров"""
+        if self.password:
+            command = command.replace(self.password, '***')
+        return command
+
+    def is_connected(self):
+        """Сессия открыта и транспорт жив (для пула сессий службы)"""
+        transport = self.client.get_transport() if self.client else None
+        return transport is not None and transport.is_active()
 
     def disconnect(self):
         """Закрытие соединения"""
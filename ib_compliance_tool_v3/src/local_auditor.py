@@ -0,0 +1,262 @@
+"""Аудит снимков файловой системы без SSH: каталог или tar-архив"""
+import fnmatch
+import logging
+import os
+import re
+import shlex
+import subprocess
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+
+from src.timing import TIMINGS
+
+logger = logging.getLogger(__name__)
+
+# Абсолютные пути в командах правил; /dev, /proc и /sys остаются как есть
+_PATH_RE = re.compile(r"(?<![\w.\-/])(/(?!dev/|proc/|sys/)[A-Za-z0-9_.+\-/*?\[\]]+)")
+# Повышение привилегий не нужно: снимок читается текущим пользователем
+_SUDO_RE = re.compile(r"echo\s+'[^']*'\s*\|\s*sudo\s+-S\s+|\bsudo\s+(-S\s+)?")
+# Команды, которые только читают файлы; остальные требуют живой системы
+SNAPSHOT_COMMANDS = {
+    'grep', 'egrep', 'fgrep', 'cat', 'head', 'tail', 'tr', 'cut', 'sort', 'uniq', 'wc',
+    'awk', 'sed', 'echo', 'printf', 'test', '[', 'ls', 'stat', 'find', 'true', 'false',
+}
+_MISSING_PREFIX = '/nonexistent-in-snapshot'
+# Символы, разделяющие звенья команды (скобки подоболочки - тоже)
+_STAGE_SEPARATORS = set('|&;()')
+
+
+class SnapshotUnsupported(Exception):
+    """Команда требует работающей системы и не может быть выполнена по снимку"""
+
+
+def strip_sudo(command):
+    """Команда без echo '<пароль>' | sudo -S"""
+    return _SUDO_RE.sub('', command)
+
+
+def _command_stages(command):
+    """Звенья команды: списки слов между |, ||, &&, ; и &, с учетом кавычек"""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    stages = [[]]
+    try:
+        for token in lexer:
+            if token and set(token) <= _STAGE_SEPARATORS:
+                stages.append([])
+            else:
+                stages[-1].append(token)
+    except ValueError:
+        # Незакрытая кавычка: разбираем грубо, как sh все равно не выполнит
+        return [stage.split() for stage in re.split(r"\|\||&&|[|;&]", command)]
+    return stages
+
+
+def command_programs(command):
+    """Имена программ во всех звеньях конвейера команды"""
+    programs = []
+    for words in _command_stages(command):
+        words = [w for w in words if '=' not in w.split('/')[0] or w.startswith('-')]
+        if words:
+            programs.append(os.path.basename(words[0]))
+    return programs
+
+
+def command_paths(command):
+    """Абсолютные пути файлов, на которые ссылается команда"""
+    return _PATH_RE.findall(command)
+
+
+class LocalAuditor:
+    """Совместимый с LinuxAuditor аудитор для снимка файловой системы.
+
+    Команды правил выполняются локальным sh, пути к файлам переписываются
+    на корень снимка. Tar-архив не распаковывается: нужные файлы читаются
+    из архива в память и передаются команде через /dev/fd.
+    """
+
+    def __init__(self, hostname, username=None, password=None, key_filename=None, root=None):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.root = root or hostname
+        self.client = None
+        self._tar = None
+        self._members = None
+        self._directories = set()
+        self._empty_directory = None
+        self._prefix = ''
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Открытие снимка"""
+        start = time.perf_counter()
+        try:
+            if os.path.isdir(self.root):
+                self.client = 'dir'
+            elif os.path.isfile(self.root) and tarfile.is_tarfile(self.root):
+                self._tar = tarfile.open(self.root, 'r:*')
+                self._members = {}
+                self._directories = set()
+                for member in self._tar.getmembers():
+                    # removeprefix, а не lstrip('./'): у скрытых файлов (.bashrc) точка - часть имени
+                    name = member.name.removeprefix('./').lstrip('/')
+                    if name in ('', '.'):
+                        continue
+                    self._members[name] = member
+                    # Каталоги, в том числе не записанные в архив отдельно
+                    parts = name.split('/')
+                    self._directories.update('/'.join(parts[:i]) for i in range(1, len(parts)))
+                    if member.isdir():
+                        self._directories.add(name.rstrip('/'))
+                self._empty_directory = tempfile.mkdtemp(prefix='snapshot-dir-')
+                self._prefix = self._detect_prefix()
+                self.client = 'tar'
+            else:
+                logger.error(f"Snapshot not found or unsupported: {self.root}")
+                return False
+            logger.info(f"Opened snapshot {self.root}")
+            return True
+        except (OSError, tarfile.TarError) as e:
+            logger.error(f"Cannot open snapshot {self.root}: {str(e)}")
+            return False
+        finally:
+            TIMINGS.add('connect', self.hostname, self.hostname, start, time.perf_counter() - start)
+
+    def _detect_prefix(self):
+        # Архив вида host1/etc/... - корень снимка внутри единственного каталога верхнего уровня
+        top_level = {name.split('/', 1)[0] for name in self._members if name}
+        if 'etc' in top_level or len(top_level) != 1:
+            return ''
+        return top_level.pop() + '/'
+
+    def execute_command(self, command):
+        """Выполнение команды правила над снимком"""
+        if not self.client:
+            raise Exception("Not connected to host")
+
+        start = time.perf_counter()
+        try:
+            command = strip_sudo(command)
+            unsupported = [p for p in command_programs(command) if p not in SNAPSHOT_COMMANDS]
+            if unsupported:
+                raise SnapshotUnsupported(f"Команда недоступна для снимка: {', '.join(unsupported)}")
+
+            if self.client == 'dir':
+                return self._run(self._rewrite_for_dir(command))
+            return self._run_tar(command)
+        finally:
+            TIMINGS.add('command', command, self.hostname, start, time.perf_counter() - start)
+
+    def _rewrite_for_dir(self, command):
+        root = shlex.quote(os.path.abspath(self.root).rstrip('/'))
+        return _PATH_RE.sub(lambda m: root + m.group(1), command)
+
+    def _tar_matches(self, path):
+        pattern = self._prefix + path.lstrip('/')
+        if any(ch in pattern for ch in '*?['):
+            return sorted(name for name, member in self._members.items()
+                          if member.isfile() and fnmatch.fnmatchcase(name, pattern))
+        member = self._members.get(pattern)
+        if member is not None and (member.isfile() or member.issym() or member.islnk()):
+            return [pattern]
+        return []
+
+    def _run_tar(self, command):
+        # Каждый файл из архива отдается команде через отдельный pipe
+        pipes = []
+
+        def replace(match):
+            names = self._tar_matches(match.group(1))
+            if not names and (self._prefix + match.group(1).strip('/')) in self._directories:
+                # Содержимое каталогов команды правил не читают, важно только их наличие
+                return self._empty_directory
+            if not names:
+                return _MISSING_PREFIX + match.group(1)
+            paths = []
+            for name in names:
+                with self._lock:
+                    data = self._tar.extractfile(self._members[name]).read()
+                read_fd, write_fd = os.pipe()
+                pipes.append((read_fd, write_fd, data))
+                paths.append(f"/dev/fd/{read_fd}")
+            return ' '.join(paths)
+
+        command = _PATH_RE.sub(replace, command)
+        writers = []
+        try:
+            for read_fd, write_fd, data in pipes:
+                writer = threading.Thread(target=_write_and_close, args=(write_fd, data), daemon=True)
+                writer.start()
+                writers.append(writer)
+            return self._run(command, pass_fds=[read_fd for read_fd, _, _ in pipes])
+        finally:
+            for read_fd, _, _ in pipes:
+                os.close(read_fd)
+            for writer in writers:
+                writer.join()
+
+    def _run(self, command, pass_fds=()):
+        completed = subprocess.run(
+            ['sh', '-c', command], stdin=subprocess.DEVNULL, capture_output=True,
+            pass_fds=pass_fds, timeout=60,
+        )
+        return (completed.stdout.decode('utf-8', 'replace').strip(),
+                completed.stderr.decode('utf-8', 'replace').strip())
+
+    def disconnect(self):
+        """Закрытие снимка"""
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        if self._empty_directory is not None:
+            shutil.rmtree(self._empty_directory, ignore_errors=True)
+            self._empty_directory = None
+        self.client = None
+
+
+def _write_and_close(fd, data):
+    try:
+        os.write(fd, data) if len(data) < 65536 else _write_all(fd, data)
+    except BrokenPipeError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def is_snapshot(path):
+    """Каталог с корнем файловой системы или tar-архив"""
+    if os.path.isdir(path):
+        return os.path.isdir(os.path.join(path, 'etc'))
+    return os.path.isfile(path) and tarfile.is_tarfile(path)
+
+
+def find_snapshots(paths):
+    """Снимки по списку путей: каталог без etc/ считается каталогом снимков.
+
+    Возвращает словарь {путь снимка: группа}, группа - имя каталога,
+    в котором лежит снимок.
+    """
+    snapshots = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        if not is_snapshot(path) and os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                candidate = os.path.join(path, name)
+                if is_snapshot(candidate):
+                    snapshots[candidate] = os.path.basename(path)
+        elif os.path.exists(path):
+            snapshots[path] = os.path.basename(os.path.dirname(path)) or 'default'
+        else:
+            logger.error(f"Snapshot not found: {path}")
+    return snapshots
@@ -0,0 +1,153 @@
+"""Правила типа package_version: проверка установленных пакетов.
+
+Список пакетов снимается одной командой dpkg-query на машину (она общая
+для всех правил типа package_version), дальше каждое правило - поиск в
+словаре и сравнение версий по правилам Debian (эпоха, ~, ревизия).
+
+Ожидаемое значение правила - одно или несколько условий через "|",
+правило выполнено, если выполнено любое из них:
+
+  openssh-server                     - пакет установлен
+  telnetd absent                     - пакет не установлен
+  postgresql-15 >= 15.14             - версия (<<, <=, =, >=, >>; < и >, как в dpkg, - это <= и >=)
+  postgresql-1[3-7] >= 13.22         - имя может быть шаблоном fnmatch
+"""
+import fnmatch
+import functools
+import re
+
+PACKAGES_COMMAND = "dpkg-query -W -f '${Status}\\t${Package}\\t${Version}\\n' 2>/dev/null || echo 'NOT_AVAILABLE'"
+
+ABSENT = 'absent'
+_OPERATORS = {
+    '<<': lambda result: result < 0,
+    # Как в dpkg: устаревшие < и > означают <= и >=, а не строгое сравнение
+    '<': lambda result: result <= 0,
+    '<=': lambda result: result <= 0,
+    '=': lambda result: result == 0,
+    '>=': lambda result: result >= 0,
+    '>>': lambda result: result > 0,
+    '>': lambda result: result >= 0,
+}
+_DIGITS_RE = re.compile(r'\d+|\D+')
+
+
+@functools.lru_cache(maxsize=64)
+def parse_packages(output):
+    """Вывод PACKAGES_COMMAND в словарь {пакет: версия} установленных пакетов"""
+    packages = {}
+    for line in output.splitlines():
+        parts = line.split('\t')
+        if len(parts) != 3:
+            continue
+        status, name, version = parts
+        # "install ok installed", "hold ok installed"; удаленные с конфигурацией (config-files) пропускаем
+        if status.split()[-1:] == ['installed'] and name:
+            packages[name] = version
+    return packages
+
+
+def _order(char):
+    """Вес символа в dpkg: ~ раньше конца строки, буквы раньше прочих символов"""
+    if char == '~':
+        return -1
+    if char.isalpha():
+        return ord(char)
+    return ord(char) + 256
+
+
+def _compare_part(left, right):
+    """Сравнение upstream-версии или ревизии (алгоритм verrevcmp из dpkg)"""
+    left_parts, right_parts = _DIGITS_RE.findall(left), _DIGITS_RE.findall(right)
+    # Части чередуются: нечисловая, числовая, нечисловая, ...
+    if left_parts and left_parts[0].isdigit():
+        left_parts.insert(0, '')
+    if right_parts and right_parts[0].isdigit():
+        right_parts.insert(0, '')
+    for index in range(max(len(left_parts), len(right_parts))):
+        left_part = left_parts[index] if index < len(left_parts) else ''
+        right_part = right_parts[index] if index < len(right_parts) else ''
+        if index % 2:
+            difference = int(left_part or 0) - int(right_part or 0)
+            if difference:
+                return difference
+            continue
+        for position in range(max(len(left_part), len(right_part))):
+            left_weight = _order(left_part[position]) if position < len(left_part) else 0
+            right_weight = _order(right_part[position]) if position < len(right_part) else 0
+            if left_weight != right_weight:
+                return left_weight - right_weight
+    return 0
+
+
+def _split_version(version):
+    epoch, _, rest = version.partition(':') if ':' in version else ('0', '', version)
+    upstream, _, revision = rest.rpartition('-') if '-' in rest else (rest, '', '')
+    return int(epoch or 0), upstream, revision
+
+
+def compare_versions(left, right):
+    """Сравнение версий Debian: <0, 0 или >0"""
+    left_epoch, left_upstream, left_revision = _split_version(left.strip())
+    right_epoch, right_upstream, right_revision = _split_version(right.strip())
+    if left_epoch != right_epoch:
+        return left_epoch - right_epoch
+    return _compare_part(left_upstream, right_upstream) or _compare_part(left_revision, right_revision)
+
+
+def parse_expected(expected):
+    """Условия правила в список (шаблон имени, оператор или None/ABSENT, версия)"""
+    conditions = []
+    for clause in expected.split('|'):
+        parts = clause.split()
+        if len(parts) == 1:
+            conditions.append((parts[0], None, None))
+        elif len(parts) == 2 and parts[1] == ABSENT:
+            conditions.append((parts[0], ABSENT, None))
+        elif len(parts) == 3 and parts[1] in _OPERATORS:
+            conditions.append((parts[0], parts[1], parts[2]))
+        else:
+            raise ValueError(f"Неверное условие package_version: {clause.strip()}")
+    return conditions
+
+
+def check_condition(packages, pattern, operator, version):
+    """(выполнено ли условие, описание найденного)"""
+    if any(char in pattern for char in '*?['):
+        names = sorted(fnmatch.filter(packages, pattern))
+    else:
+        names = [pattern] if pattern in packages else []
+    if operator == ABSENT:
+        if names:
+            return False, ', '.join(f"{name} {packages[name]} установлен" for name in names)
+        return True, f"{pattern} не установлен"
+    if not names:
+        return False, f"{pattern} не установлен"
+    found = ', '.join(f"{name} {packages[name]}" for name in names)
+    if operator is None:
+        return True, found
+    passed = any(_OPERATORS[operator](compare_versions(packages[name], version)) for name in names)
+    return passed, found
+
+
+def evaluate_packages(expected, output):
+    """Оценка правила package_version, возвращает (status, actual_display)"""
+    if output.strip() == 'NOT_AVAILABLE':
+        return "ERROR", "dpkg-query недоступен"
+    try:
+        conditions = parse_expected(expected)
+    except ValueError as e:
+        return "ERROR", str(e)
+    packages = parse_packages(output)
+    details = []
+    for condition in conditions:
+        passed, found = check_condition(packages, *condition)
+        if passed:
+            return "PASS", found
+        details.append(found)
+    return "FAIL", '; '.join(details)
+
+
+# Функции оценки для отпечатка evaluator_version в main.py
+PACKAGES_EVALUATORS = (parse_packages.__wrapped__, _order, _compare_part, _split_version, compare_versions,
+                       parse_expected, check_condition, evaluate_packages)
@@ -0,0 +1,120 @@
+"""Распределение машин по рабочим процессам"""
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections import Counter
+
+from src.eval_cache import save_evaluation_caches
+from src.timing import TIMINGS
+
+WORKER_EXIT_TIMEOUT = 5
+
+
+def _process_worker(task_queue, event_queue, audit_func, audit_args, threads, log_level, timing_settings):
+    """Рабочий процесс: несколько потоков забирают машины из общей очереди"""
+    logging.getLogger().setLevel(log_level)
+    TIMINGS.configure(*timing_settings)
+    TIMINGS.drain()
+
+    def thread_loop():
+        while True:
+            host = task_queue.get()
+            if host is None:
+                return
+            event_queue.put(('started', host, None))
+            try:
+                host_result = audit_func(host, *audit_args)
+            except Exception as e:
+                host_result = {"host": host, "results": [], "status": "error", "error": f"Ошибка: {str(e)}"}
+            event_queue.put(('finished', host, host_result))
+
+    workers = [threading.Thread(target=thread_loop, daemon=True) for _ in range(max(threads, 1))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # До последнего события: получив его, родитель может завершить процесс
+    save_evaluation_caches()
+    event_queue.put(('timings', None, TIMINGS.drain()))
+
+
+def iter_sharded_results(hosts, audit_func, audit_args, processes, threads, log_level=logging.ERROR):
+    """Аудит машин в пуле процессов, в каждом - свой пул потоков.
+
+    Машины раздаются через общую очередь, поэтому быстрые процессы
+    забирают больше работы. Генератор отдает события по мере готовности:
+    ('started', host, None) и ('finished', host, host_result). Замеры
+    времени из процессов добавляются в TIMINGS родителя.
+    """
+    hosts = list(hosts)
+    # spawn: родитель к этому моменту уже может держать потоки (живая панель)
+    context = multiprocessing.get_context('spawn')
+    task_queue = context.Queue()
+    event_queue = context.Queue()
+    for host in hosts:
+        task_queue.put(host)
+    for _ in range(processes * max(threads, 1)):
+        task_queue.put(None)
+
+    workers = [
+        context.Process(
+            target=_process_worker,
+            args=(task_queue, event_queue, audit_func, audit_args, threads, log_level, TIMINGS.settings()),
+            daemon=True,
+        )
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    pending = Counter(hosts)
+    reported_timings = 0
+    try:
+        while pending and reported_timings < processes:
+            try:
+                kind, host, payload = event_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+
+            if kind == 'started':
+                yield kind, host, None
+            elif kind == 'finished':
+                pending[host] -= 1
+                if pending[host] <= 0:
+                    del pending[host]
+                yield kind, host, payload
+            elif kind == 'timings':
+                reported_timings += 1
+                TIMINGS.merge(payload)
+
+        # Машины, которые не успели проверить из-за падения процессов
+        for host, count in pending.items():
+            for _ in range(count):
+                yield 'finished', host, {
+                    "host": host, "results": [], "status": "error",
+                    "error": "Рабочий процесс завершился аварийно"
+                }
+
+        # Дочитываем замеры из процессов, завершившихся штатно
+        while reported_timings < processes:
+            try:
+                kind, _, payload = event_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            if kind == 'timings':
+                reported_timings += 1
+                TIMINGS.merge(payload)
+    finally:
+        # Штатно завершающимся процессам даем доработать (общий срок на все), зависшие - завершаем
+        deadline = time.monotonic() + WORKER_EXIT_TIMEOUT
+        for worker in workers:
+            worker.join(timeout=max(deadline - time.monotonic(), 0))
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
@@ -0,0 +1,146 @@
+"""Предусловия правил: граф зависимостей и проверка одной командой.
+
+Предусловие описывается в разделе preconditions файла правил:
+
+  - id: "fly_dmrc_present"
+    requires: ["fly_dm_installed"]      # другие предусловия (граф без циклов)
+    requires_file: "/etc/X11/fly-dm/fly-dmrc.bak"
+    on_fail: "FAIL"                     # по умолчанию "NOT_APPLICABLE"
+
+Правило ссылается на предусловия полем requires. Если предусловие или
+любое из тех, от которых оно зависит, не выполнено, правило не
+выполняется и получает статус on_fail того предусловия, которое не
+выполнено первым по графу: нет fly-dm - NOT_APPLICABLE, fly-dm есть, а
+файла конфигурации нет - FAIL.
+"""
+import logging
+import shlex
+
+logger = logging.getLogger(__name__)
+
+NOT_APPLICABLE = 'NOT_APPLICABLE'
+ON_FAIL_STATUSES = (NOT_APPLICABLE, 'FAIL')
+PRECONDITION_KINDS = ('requires_file', 'requires_command')
+
+
+def precondition_order(preconditions, rules_file='rules'):
+    """Проверка раздела preconditions; возвращает id в порядке зависимостей"""
+    by_id = {}
+    for position, precondition in enumerate(preconditions):
+        if not isinstance(precondition, dict) or 'id' not in precondition:
+            raise ValueError(f"{rules_file}: предусловие #{position + 1} без id")
+        kinds = [kind for kind in PRECONDITION_KINDS if kind in precondition]
+        if len(kinds) != 1:
+            raise ValueError(f"{rules_file}: предусловие {precondition['id']} должно задавать "
+                             f"ровно одно из {', '.join(PRECONDITION_KINDS)}")
+        if precondition.get('on_fail', NOT_APPLICABLE) not in ON_FAIL_STATUSES:
+            raise ValueError(f"{rules_file}: предусловие {precondition['id']}: on_fail - "
+                             f"{' или '.join(ON_FAIL_STATUSES)}")
+        by_id[precondition['id']] = precondition
+
+    order = []
+    state = {}
+
+    def visit(precondition_id, path):
+        if state.get(precondition_id) == 'done':
+            return
+        if state.get(precondition_id) == 'visiting':
+            raise ValueError(f"{rules_file}: цикл в предусловиях: {' -> '.join(path + [precondition_id])}")
+        if precondition_id not in by_id:
+            raise ValueError(f"{rules_file}: неизвестное предусловие {precondition_id}")
+        state[precondition_id] = 'visiting'
+        for parent in by_id[precondition_id].get('requires', []):
+            visit(parent, path + [precondition_id])
+        state[precondition_id] = 'done'
+        order.append(precondition_id)
+
+    for precondition_id in by_id:
+        visit(precondition_id, [])
+    return order
+
+
+def precondition_check(precondition):
+    """Команда sh, завершающаяся успешно, если предусловие выполнено"""
+    if 'requires_file' in precondition:
+        return f"test -e {shlex.quote(precondition['requires_file'])}"
+    return f"command -v {shlex.quote(precondition['requires_command'])} >/dev/null 2>&1"
+
+
+def describe(precondition):
+    if 'requires_file' in precondition:
+        return f"нет файла {precondition['requires_file']}"
+    return f"нет команды {precondition['requires_command']}"
+
+
+class PreconditionGraph:
+    """Предусловия из файла правил в порядке зависимостей"""
+
+    def __init__(self, preconditions):
+        self.by_id = {precondition['id']: precondition for precondition in preconditions}
+        self.order = precondition_order(preconditions)
+
+    def needed(self, rules):
+        """Предусловия, от которых зависят правила, вместе с их предками"""
+        needed = set()
+        stack = [precondition_id for rule in rules for precondition_id in rule.get('requires', [])]
+        while stack:
+            precondition_id = stack.pop()
+            if precondition_id not in needed:
+                needed.add(precondition_id)
+                stack.extend(self.by_id[precondition_id].get('requires', []))
+        return [precondition_id for precondition_id in self.order if precondition_id in needed]
+
+    def evaluate(self, auditor, rules):
+        """Невыполненные предусловия {id: (статус для правил, причина)} за одну команду.
+
+        Предусловия, которые не удалось проверить (например, команда
+        недоступна для снимка), считаются выполненными: правила запустятся
+        как обычно.
+        """
+        needed = self.needed(rules)
+        if not needed:
+            return {}
+        try:
+            outcome = self._run_batch(auditor, needed)
+        except Exception as e:
+            logger.warning(f"Batched precondition check failed on {auditor.hostname}: {e}")
+            outcome = {}
+            for precondition_id in needed:
+                try:
+                    outcome.update(self._run_batch(auditor, [precondition_id]))
+                except Exception:
+                    continue
+
+        failed = {}
+        # Порядок зависимостей: предки уже обработаны
+        for precondition_id in needed:
+            precondition = self.by_id[precondition_id]
+            parents = [parent for parent in precondition.get('requires', []) if parent in failed]
+            if parents:
+                # Не выполнен предок: статус и причина - от него (нет подсистемы - NOT_APPLICABLE,
+                # даже если у зависимого предусловия on_fail FAIL)
+                failed[precondition_id] = failed[parents[0]]
+            elif outcome.get(precondition_id) is False:
+                failed[precondition_id] = (precondition.get('on_fail', NOT_APPLICABLE), describe(precondition))
+        return failed
+
+    def _run_batch(self, auditor, precondition_ids):
+        script = '; '.join(
+            f"{precondition_check(self.by_id[precondition_id])} && echo {index}=1 || echo {index}=0"
+            for index, precondition_id in enumerate(precondition_ids)
+        )
+        output, _ = auditor.execute_command(script)
+        outcome = {}
+        for line in output.splitlines():
+            index, _, value = line.strip().partition('=')
+            if index.isdigit() and int(index) < len(precondition_ids):
+                outcome[precondition_ids[int(index)]] = value == '1'
+        return outcome
+
+
+def rule_precondition_failure(rule, failed):
+    """(статус, причина) для правила с невыполненным предусловием или None"""
+    for precondition_id in rule.get('requires', []):
+        if precondition_id in failed:
+            return failed[precondition_id]
+    return None
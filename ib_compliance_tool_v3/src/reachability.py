@@ -0,0 +1,116 @@
+"""Предварительная проверка доступности машин по TCP (порт SSH).
+
+Выключенная машина задерживает проверку на полный таймаут подключения
+paramiko. Перед проверкой весь список опрашивается асинхронно, с большим
+числом одновременных подключений и коротким таймаутом на машину: машины,
+не ответившие за таймаут, сразу отмечаются как unreachable, остальные
+(в том числе не опрошенные к общему сроку) идут в проверку.
+"""
+import os
+
+SSH_PORT = 22
+DEFAULT_TIMEOUT = 3.0
+# Разрешение имени ждет свободного потока и не входит в таймаут подключения
+RESOLVE_TIMEOUT = 30.0
+DEFAULT_CONCURRENCY = 512
+BANNER_PREFIX = b'SSH-'
+
+
+def _describe(error):
+    """Текст ошибки сокета: у asyncio strerror содержит адрес, у gaierror errno отрицательный"""
+    if error.errno and error.errno > 0:
+        return os.strerror(error.errno)
+    return error.strerror or str(error)
+
+
+async def resolve_host(host, port, timeout):
+    """Адрес машины: IP-адрес как есть, имя - через DNS со своим сроком"""
+    import asyncio
+    import ipaddress
+    import socket
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    loop = asyncio.get_running_loop()
+    infos = await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+    return infos[0][4][0]
+
+
+async def probe_host(host, timeout, read_banner=False, port=SSH_PORT, resolve_timeout=RESOLVE_TIMEOUT):
+    """(доступна ли машина, пояснение) для одной машины; None - доступность неизвестна"""
+    import asyncio
+    import socket
+    # Имя разрешается до отсчета таймаута подключения: при сотнях одновременных запросов
+    # они ждут очереди в пуле потоков, и живая машина не должна считаться недоступной
+    try:
+        address = await resolve_host(host, port, resolve_timeout)
+    except asyncio.TimeoutError:
+        return None, f"имя не разрешилось за {resolve_timeout:.0f} с"
+    except socket.gaierror as e:
+        return False, f"имя не найдено: {_describe(e)}"
+    except OSError as e:
+        return None, f"ошибка разрешения имени: {_describe(e)}"
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+    except asyncio.TimeoutError:
+        return False, f"нет ответа на порт {port} за {timeout:.1f} с"
+    except OSError as e:
+        return False, f"порт {port}: {_describe(e)}"
+    try:
+        if not read_banner:
+            return True, f"порт {port} открыт"
+        try:
+            banner = await asyncio.wait_for(reader.readline(), timeout)
+        except (asyncio.TimeoutError, OSError):
+            return False, f"порт {port} открыт, но нет баннера SSH"
+        if not banner.startswith(BANNER_PREFIX):
+            return False, f"порт {port} открыт, но это не SSH: {banner[:40]!r}"
+        return True, banner.decode('ascii', 'replace').strip()
+    finally:
+        writer.close()
+
+
+async def _scan(hosts, timeout, deadline, concurrency, read_banner, port):
+    import asyncio
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def limited(host):
+        async with semaphore:
+            # Срок отсчитывается от начала опроса машины, а не от начала всего опроса:
+            # машина в конце длинной очереди получает тот же timeout
+            results[host] = await probe_host(host, timeout, read_banner, port)
+
+    tasks = [asyncio.ensure_future(limited(host)) for host in dict.fromkeys(hosts)]
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+    return results
+
+
+def scan_hosts(hosts, timeout=DEFAULT_TIMEOUT, deadline=None, concurrency=DEFAULT_CONCURRENCY,
+               read_banner=False, port=SSH_PORT):
+    """Опрос машин с таймаутом timeout на каждую: {host: (доступна, пояснение)}.
+
+    Доступность None - неизвестна (не разрешилось имя): такая машина идет
+    в проверку. deadline ограничивает весь опрос; машин, до которых
+    очередь не дошла, в результате нет - они тоже идут в проверку.
+    """
+    import asyncio
+    if not hosts:
+        return {}
+    return asyncio.run(_scan(hosts, timeout, deadline, concurrency, read_banner, port))
+
+
+def unreachable_result(host, reason):
+    """Запись недоступной машины для сводного отчета"""
+    return {
+        "host": host,
+        "results": [],
+        "status": "unreachable",
+        "error": f"Недоступна: {reason}",
+    }
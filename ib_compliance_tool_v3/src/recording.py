@@ -0,0 +1,131 @@
+"""Запись выводов команд с машин и повторная проверка по записи.
+
+Запись одной машины - gzip JSON в каталоге записи:
+  {"host": ..., "recorded_at": ..., "outputs": {команда: [stdout, stderr]}}
+Команды хранятся нормализованными: пароль заменен на {password}, поэтому
+запись не содержит пароля и совпадает с командами правил из YAML.
+"""
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+from src.timing import TIMINGS
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_PLACEHOLDER = '{password}'
+RECORD_SUFFIX = '.json.gz'
+
+
+def normalize_command(command, password):
+    """Команда с паролем, замененным на {password}"""
+    if password:
+        command = command.replace(password, PASSWORD_PLACEHOLDER)
+    return command
+
+
+def record_path(directory, host):
+    return os.path.join(directory, quote(host, safe='') + RECORD_SUFFIX)
+
+
+def recorded_hosts(directory):
+    """Машины, для которых в каталоге есть запись"""
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    return [unquote(name[:-len(RECORD_SUFFIX)]) for name in names if name.endswith(RECORD_SUFFIX)]
+
+
+def load_recording(directory, host):
+    with gzip.open(record_path(directory, host), 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_recording(directory, host, outputs):
+    """Атомарная запись выводов одной машины"""
+    os.makedirs(directory, exist_ok=True)
+    path = record_path(directory, host)
+    data = {
+        'host': host,
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'outputs': {command: list(output) for command, output in outputs.items()},
+    }
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return path
+
+
+class RecordingAuditor:
+    """Обертка над аудитором: сохраняет выводы всех команд при отключении"""
+
+    def __init__(self, auditor, directory):
+        self.auditor = auditor
+        self.directory = directory
+        self.hostname = auditor.hostname
+        self.outputs = {}
+        if hasattr(auditor, 'run_collector'):
+            self.run_collector = self._run_collector
+
+    def connect(self):
+        return self.auditor.connect()
+
+    def execute_command(self, command):
+        output = self.auditor.execute_command(command)
+        self.outputs[normalize_command(command, self.auditor.password)] = output
+        return output
+
+    def _run_collector(self, commands):
+        outputs = self.auditor.run_collector(commands)
+        for command, output in zip(commands, outputs):
+            self.outputs[normalize_command(command, self.auditor.password)] = output
+        return outputs
+
+    def disconnect(self):
+        try:
+            self.auditor.disconnect()
+        finally:
+            if self.outputs:
+                save_recording(self.directory, self.hostname, self.outputs)
+
+
+class ReplayAuditor:
+    """Совместимый с LinuxAuditor аудитор, отдающий записанные выводы команд"""
+
+    def __init__(self, hostname, username=None, password=None, key_filename=None, directory='recordings'):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.directory = directory
+        self.client = None
+
+    def connect(self):
+        """Загрузка записи машины"""
+        start = time.perf_counter()
+        try:
+            self.client = load_recording(self.directory, self.hostname)['outputs']
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"No recording for {self.hostname} in {self.directory}: {str(e)}")
+            return False
+        finally:
+            TIMINGS.add('connect', self.hostname, self.hostname, start, time.perf_counter() - start)
+
+    def execute_command(self, command):
+        """Записанный вывод команды; команды, которой не было в записи, - ошибка"""
+        if self.client is None:
+            raise Exception("Not connected to host")
+        command = normalize_command(command, self.password)
+        output = self.client.get(command)
+        if output is None:
+            raise Exception("Команда отсутствует в записи")
+        return output[0], output[1]
+
+    def disconnect(self):
+        self.client = None
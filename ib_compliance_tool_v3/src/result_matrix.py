@@ -0,0 +1,294 @@
+"""Колоночное хранение результатов аудита по всему парку машин"""
+import ipaddress
+from array import array
+from collections import Counter
+from itertools import compress
+from operator import attrgetter
+
+from src.check_result import CheckResult
+
+_NUMPY = False
+
+# Код статуса = индекс в кортеже
+CHECK_STATUSES = ('NONE', 'PASS', 'FAIL', 'ERROR', 'NOT_APPLICABLE')
+HOST_STATUSES = ('completed', 'failed', 'error', 'unreachable')
+
+_CHECK_CODES = {status: code for code, status in enumerate(CHECK_STATUSES)}
+_HOST_CODES = {status: code for code, status in enumerate(HOST_STATUSES)}
+_ERROR_CODE = _CHECK_CODES['ERROR']
+_RULE = attrgetter('rule')
+_RULE_ID = attrgetter('rule.id')
+_STATUS = attrgetter('status')
+
+
+class _StatusCodes(dict):
+    """Коды статусов для map(__getitem__); неизвестный статус - ERROR"""
+
+    def __missing__(self, status):
+        return _ERROR_CODE
+
+
+_STATUS_CODES = _StatusCodes(_CHECK_CODES)
+
+# Вес критичности для ранжирования правил по влиянию на парк
+SEVERITY_WEIGHTS = {'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
+
+
+def _numpy():
+    """numpy загружается при первой агрегации: он необязателен и долго импортируется"""
+    global _NUMPY
+    if _NUMPY is False:
+        try:
+            import numpy
+        except ImportError:  # без numpy считаем на array + Counter
+            numpy = None
+        _NUMPY = numpy
+    return _NUMPY
+
+
+def default_host_group(host):
+    """Группа хоста по умолчанию: подсеть /24 для IPv4 или домен для имени"""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        _, _, domain = host.partition('.')
+        return domain or 'default'
+    if address.version == 4:
+        # Маска на целом числе втрое быстрее ip_network(strict=False) - заметно на десятках тысяч хостов
+        return f"{ipaddress.IPv4Address(int(address) & 0xFFFFFF00)}/24"
+    return str(ipaddress.ip_network(f"{address}/64", strict=False))
+
+
+class ResultMatrix:
+    """Результаты проверок в виде колонок (хост, правило, статус).
+
+    Имена хостов и идентификаторы правил интернируются в целочисленные
+    индексы, статусы хранятся однобайтовыми кодами. Все агрегаты считаются
+    одним проходом по колонкам (numpy, если установлен).
+    """
+
+    def __init__(self):
+        self.hosts = []
+        self.host_status = array('b')
+        self.host_group = array('I')
+        self.groups = []
+        self._group_index = {}
+        self.rule_ids = []
+        self.rule_meta = []
+        self._rule_index = {}
+        self.host_offsets = array('L', [0])
+        self.cell_host = array('I')
+        self.cell_rule = array('I')
+        self.cell_status = array('b')
+        # Строки индексов правил: хосты с одинаковым набором правил разделяют одну строку
+        self.rows = []
+        self.host_row = array('i')
+        self._row_cache = {}
+        self._row_usage = Counter()
+
+    @classmethod
+    def from_results(cls, all_results):
+        matrix = cls()
+        for host_result in all_results:
+            matrix.add_host(host_result)
+        return matrix
+
+    def _intern_rule(self, rule_id, check):
+        index = self._rule_index.get(rule_id)
+        if index is None:
+            index = len(self.rule_ids)
+            self._rule_index[rule_id] = index
+            self.rule_ids.append(rule_id)
+            if isinstance(check, CheckResult):
+                self.rule_meta.append((check.rule.name, check.rule.severity))
+            else:
+                self.rule_meta.append((check.get('name', rule_id), check.get('severity', 'MEDIUM')))
+        return index
+
+    def _intern_group(self, group):
+        index = self._group_index.get(group)
+        if index is None:
+            index = len(self.groups)
+            self._group_index[group] = index
+            self.groups.append(group)
+        return index
+
+    def add_host(self, host_result):
+        """Добавление результатов одного хоста"""
+        host_index = len(self.hosts)
+        self.hosts.append(host_result['host'])
+        self.host_status.append(_HOST_CODES.get(host_result['status'], _HOST_CODES['error']))
+        group_index = self._intern_group(host_result.get('group') or default_host_group(host_result['host']))
+        self.host_group.append(group_index)
+
+        checks = host_result.get('results', []) if host_result['status'] == 'completed' else []
+        if not checks:
+            self.host_row.append(-1)
+            self.host_offsets.append(len(self.cell_status))
+            return
+        # CheckResult читаем по атрибутам: доступ как к словарю на каждую ячейку заметно дороже.
+        # Ключ строки - кортеж интернированных RuleMeta: id правил нужны только для новой строки
+        if isinstance(checks[0], CheckResult):
+            key = tuple(map(_RULE, checks))
+            statuses = map(_STATUS, checks)
+        else:
+            key = tuple(check['id'] for check in checks)
+            statuses = (check['status'] for check in checks)
+        row_index = self._row_cache.get(key)
+        if row_index is None:
+            row_index = self._row_cache[key] = len(self.rows)
+            self.rows.append(self._intern_row(checks))
+        row = self.rows[row_index]
+        self._row_usage[row_index, group_index] += 1
+        self.host_row.append(row_index)
+        self.cell_rule.extend(row)
+        self.cell_host.extend(array('I', [host_index]) * len(row))
+        self.cell_status.frombytes(bytes(map(_STATUS_CODES.__getitem__, statuses)))
+        self.host_offsets.append(len(self.cell_status))
+
+    def _intern_row(self, checks):
+        # В наборах правил встречаются повторяющиеся id - различаем по номеру вхождения
+        if isinstance(checks[0], CheckResult):
+            rule_ids = map(_RULE_ID, checks)
+        else:
+            rule_ids = (check['id'] for check in checks)
+        seen = Counter()
+        row = array('I')
+        for rule_id, check in zip(rule_ids, checks):
+            seen[rule_id] += 1
+            if seen[rule_id] > 1:
+                rule_id = f"{rule_id}#{seen[rule_id]}"
+            row.append(self._intern_rule(rule_id, check))
+        return row
+
+    def host_status_counts(self):
+        """Количество хостов по статусам: completed/failed/error"""
+        counts = _bincount(self.host_status, len(HOST_STATUSES))
+        return dict(zip(HOST_STATUSES, counts))
+
+    def check_status_counts(self):
+        """Количество проверок по статусам по всему парку"""
+        statuses = self.cell_status.tobytes()
+        return {status: statuses.count(bytes([code])) for code, status in enumerate(CHECK_STATUSES)}
+
+    def rule_group_failures(self):
+        """Матрица правило x группа хостов, ранжированная по влиянию.
+
+        Возвращает список словарей по правилам хотя бы с одним FAIL,
+        отсортированный по убыванию impact = FAIL * вес критичности.
+        В 'groups' для каждой группы лежит пара (FAIL, всего проверок);
+        неприменимые проверки (NOT_APPLICABLE) в число проверок не входят.
+        """
+        n_groups = len(self.groups)
+        totals = Counter()
+        for (row_index, group_index), usage in self._row_usage.items():
+            for index in self.rows[row_index]:
+                totals[index, group_index] += usage
+
+        failed, not_applicable = self._rule_group_counts(_CHECK_CODES['FAIL'], _CHECK_CODES['NOT_APPLICABLE'])
+        # Неприменимые проверки в total не входят - как в host_scores
+        for key, count in not_applicable.items():
+            totals[divmod(key, n_groups)] -= count
+
+        rows = {}
+        for key, count in failed.items():
+            rule_index, group_index = divmod(key, n_groups)
+            row = rows.get(rule_index)
+            if row is None:
+                name, severity = self.rule_meta[rule_index]
+                row = rows[rule_index] = {
+                    'rule_id': self.rule_ids[rule_index],
+                    'name': name,
+                    'severity': severity,
+                    'failed': 0,
+                    'total': 0,
+                    'groups': {},
+                }
+            row['failed'] += count
+            row['groups'][self.groups[group_index]] = (count, totals[rule_index, group_index])
+
+        for rule_index, row in rows.items():
+            for group_index, group in enumerate(self.groups):
+                total = totals[rule_index, group_index]
+                if total and group not in row['groups']:
+                    row['groups'][group] = (0, total)
+                row['total'] += total
+            row['rate'] = row['failed'] / row['total'] if row['total'] else 0.0
+            row['impact'] = row['failed'] * SEVERITY_WEIGHTS.get(row['severity'], 1)
+        return sorted(rows.values(), key=lambda r: (-r['impact'], -r['rate'], r['rule_id']))
+
+    def _rule_group_counts(self, *status_codes):
+        """По каждому коду статуса {rule * n_groups + group: число ячеек со статусом}"""
+        n_groups = len(self.groups)
+        np = _numpy()
+        if np is not None and len(self.cell_status):
+            host_group = np.frombuffer(self.host_group, dtype=self.host_group.typecode)
+            statuses = np.frombuffer(self.cell_status, dtype=self.cell_status.typecode)
+            cell_host = np.frombuffer(self.cell_host, dtype=self.cell_host.typecode)
+            cell_rule = np.frombuffer(self.cell_rule, dtype=self.cell_rule.typecode)
+            result = []
+            for status_code in status_codes:
+                mask = statuses == status_code
+                keys = cell_rule[mask].astype(np.int64) * n_groups + host_group[cell_host[mask]]
+                values, counts = np.unique(keys, return_counts=True)
+                result.append(dict(zip(values.tolist(), counts.tolist())))
+            return result
+
+        # Без numpy: хосты с одной строкой правил и одной группой образуют блок одинаковых
+        # по длине срезов. Срезы блока склеиваются, и статус правила в позиции j считается
+        # bytes.count по срезу [j::длина строки] - цикл по ячейкам идет внутри bytes
+        blocks = {}
+        offsets = self.host_offsets
+        for host_index, row_index in enumerate(self.host_row):
+            if row_index >= 0:
+                blocks.setdefault((row_index, self.host_group[host_index]), []).append(host_index)
+        statuses = self.cell_status.tobytes()
+        codes = [bytes([status_code]) for status_code in status_codes]
+        result = [Counter() for _ in status_codes]
+        for (row_index, group_index), host_indexes in blocks.items():
+            row = self.rows[row_index]
+            block = b''.join([statuses[offsets[i]:offsets[i + 1]] for i in host_indexes])
+            width = len(row)
+            for code, counts in zip(codes, result):
+                if code not in block:
+                    continue
+                for position, rule_index in enumerate(row):
+                    count = block[position::width].count(code)
+                    if count:
+                        counts[rule_index * n_groups + group_index] += count
+        return result
+
+    def group_sizes(self):
+        """Количество успешно проверенных хостов в каждой группе"""
+        completed_code = _HOST_CODES['completed']
+        counts = Counter(compress(self.host_group, map(completed_code.__eq__, self.host_status)))
+        return {self.groups[index]: count for index, count in counts.items()}
+
+    def host_scores(self):
+        """Список (passed, failed, total) по каждому хосту в порядке добавления.
+
+        Неприменимые проверки (NOT_APPLICABLE) в total не входят.
+        """
+        # Ячейки хоста лежат подряд, поэтому считаем байты в срезе без цикла по ячейкам
+        statuses = self.cell_status.tobytes()
+        pass_code = bytes([_CHECK_CODES['PASS']])
+        fail_code = bytes([_CHECK_CODES['FAIL']])
+        na_code = bytes([_CHECK_CODES['NOT_APPLICABLE']])
+        offsets = self.host_offsets
+        return [
+            (statuses.count(pass_code, offsets[i], offsets[i + 1]),
+             statuses.count(fail_code, offsets[i], offsets[i + 1]),
+             offsets[i + 1] - offsets[i] - statuses.count(na_code, offsets[i], offsets[i + 1]))
+            for i in range(len(self.hosts))
+        ]
+
+
+def _bincount(values, length):
+    """Подсчет вхождений каждого кода 0..length-1"""
+    np = _numpy()
+    if np is not None:
+        data = np.frombuffer(values, dtype=values.typecode) if len(values) else np.zeros(0, dtype=int)
+        return [int(x) for x in np.bincount(data, minlength=length)[:length]]
+    counter = Counter(values)
+    return [counter.get(i, 0) for i in range(length)]
+
@@ -0,0 +1,95 @@
+"""Загрузка правил: libyaml, кэш разобранных правил на диске и в памяти процесса"""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import threading
+
+from src.preconditions import precondition_order
+
+logger = logging.getLogger(__name__)
+
+# Увеличивать при изменении формата разобранных правил
+RULES_CACHE_VERSION = 2
+RULES_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'ib_compliance_tool',
+)
+
+_LOADED = {}
+_LOADED_LOCK = threading.Lock()
+
+
+def validate_rules(data, rules_file):
+    """Проверка структуры файла правил"""
+    if not isinstance(data, dict) or not isinstance(data.get('rules', []), list):
+        raise ValueError(f"{rules_file}: ожидается словарь со списком 'rules'")
+    preconditions = data.get('preconditions', [])
+    known = set(precondition_order(preconditions, rules_file))
+    for position, rule in enumerate(data.get('rules', [])):
+        if not isinstance(rule, dict) or 'id' not in rule or 'name' not in rule:
+            raise ValueError(f"{rules_file}: правило #{position + 1} без id или name")
+        unknown = [precondition_id for precondition_id in rule.get('requires', []) if precondition_id not in known]
+        if unknown:
+            raise ValueError(f"{rules_file}: правило {rule['id']} ссылается на неизвестные предусловия: "
+                             f"{', '.join(unknown)}")
+    return data
+
+
+def _parse_yaml(content):
+    import yaml
+    # C-загрузчик из libyaml в разы быстрее, если pyyaml собран с ним
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(content, Loader=loader)
+
+
+def _cache_path(content, cache_dir):
+    digest = hashlib.sha256(content)
+    digest.update(f"\0{RULES_CACHE_VERSION}\0{sys.version_info[:2]}".encode('utf-8'))
+    return os.path.join(cache_dir, digest.hexdigest() + '.pickle')
+
+
+def _load_from_file(rules_file, cache_dir):
+    with open(rules_file, 'rb') as f:
+        content = f.read()
+
+    cache_path = _cache_path(content, cache_dir) if cache_dir else None
+    if cache_path:
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Rules cache {cache_path} is unreadable: {e}")
+
+    data = validate_rules(_parse_yaml(content), rules_file)
+
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            # Кэш - только ускорение, без него правила все равно загружены
+            logger.debug(f"Cannot write rules cache {cache_path}: {e}")
+    return data
+
+
+def load_rules(rules_file, cache_dir=RULES_CACHE_DIR):
+    """Загрузка правил из YAML файла.
+
+    Внутри процесса файл разбирается один раз, пока не изменится; между
+    запусками разобранные правила берутся из кэша по хешу содержимого.
+    Возвращаемый словарь общий для всех вызовов и не должен изменяться.
+    """
+    stat = os.stat(rules_file)
+    key = (os.path.abspath(rules_file), stat.st_mtime_ns, stat.st_size)
+    with _LOADED_LOCK:
+        data = _LOADED.get(key)
+        if data is None:
+            data = _LOADED[key] = _load_from_file(rules_file, cache_dir)
+    return data
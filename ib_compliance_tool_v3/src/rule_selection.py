@@ -0,0 +1,68 @@
+"""Выбор подмножества правил: по критичности, тегам и шаблонам id"""
+import fnmatch
+
+from src.local_auditor import command_paths
+
+# Неявные теги по файлам, которые читает команда правила
+PATH_TAGS = (
+    ('/etc/pam.d/', 'pam'),
+    ('/etc/ssh/', 'ssh'),
+    ('/etc/astra-syslog.conf', 'syslog'),
+    ('/etc/security/limits', 'limits'),
+    ('/etc/X11/fly-dm/', 'fly'),
+    ('/usr/share/fly-wm/', 'fly'),
+    ('/etc/audit/', 'audit'),
+    ('/etc/cups/', 'cups'),
+    ('/etc/fstab', 'fstab'),
+    ('/etc/login.defs', 'login'),
+    ('/etc/default/grub', 'grub'),
+    ('/etc/afick', 'afick'),
+)
+
+
+_SELECTED = {}
+
+
+def rule_tags(rule):
+    """Теги правила: явные из поля tags, префикс id и теги по читаемым файлам"""
+    tags = {str(tag).lower() for tag in rule.get('tags', [])}
+    tags.add(rule['id'].split('_', 1)[0].lower())
+    command = rule.get('check', {}).get('command', '')
+    for path in command_paths(command):
+        tags.update(tag for prefix, tag in PATH_TAGS if path.startswith(prefix))
+    if 'astra-' in command or rule.get('type') == 'astra_control':
+        tags.add('astra')
+    return tags
+
+
+def parse_selector(value, upper=False):
+    """Значение вида "a,b" из командной строки в кортеж"""
+    if not value:
+        return ()
+    items = (item.strip() for item in value.split(','))
+    return tuple(item.upper() if upper else item for item in items if item)
+
+
+def select_rules(rules, severities=(), tags=(), patterns=()):
+    """Правила, подходящие под все заданные селекторы (внутри селектора - любое значение).
+
+    Результат запоминается: список правил от load_rules общий для всех машин.
+    """
+    if not (severities or tags or patterns):
+        return rules
+    key = (id(rules), severities, tags, patterns)
+    cached = _SELECTED.get(key)
+    if cached is not None and cached[0] is rules:
+        return cached[1]
+    tags = {tag.lower() for tag in tags}
+    selected = []
+    for rule in rules:
+        if severities and rule.get('severity', 'MEDIUM').upper() not in severities:
+            continue
+        if patterns and not any(fnmatch.fnmatchcase(rule['id'], pattern) for pattern in patterns):
+            continue
+        if tags and not tags & rule_tags(rule):
+            continue
+        selected.append(rule)
+    _SELECTED[key] = (rules, selected)
+    return selected
@@ -0,0 +1,153 @@
+"""Непрерывная проверка парка: машины равномерно распределены по времени.
+
+Вместо обхода всего парка в одно время (пик нагрузки на сервер проверки,
+промежуточные узлы и sshd машин) каждая машина проверяется по своему
+расписанию:
+
+- первая проверка машин равномерно распределена по окну window
+  (порядок машин - по хешу имени, поэтому стабилен между запусками);
+- повторная - через interval со случайным отклонением jitter (доля
+  интервала), чтобы машины не собирались обратно в одну волну;
+- правила HIGH дополнительно проверяются чаще, через high_interval;
+- одновременно проверяется не больше concurrency машин.
+"""
+import hashlib
+import heapq
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FULL = 'full'
+HIGH = 'high'
+_DURATION_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([smhd]?)$')
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(value):
+    """"90", "15m", "4h", "1d" в секунды"""
+    match = _DURATION_RE.match(str(value).strip().lower())
+    if not match:
+        raise ValueError(f"Неверная длительность: {value} (ожидается, например, 30m, 4h, 1d)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def format_duration(seconds):
+    if seconds >= 3600:
+        return f"{seconds / 3600:g} ч"
+    if seconds >= 60:
+        return f"{seconds / 60:g} мин"
+    return f"{seconds:g} с"
+
+
+def _host_position(host):
+    """Стабильное место машины в окне: доля от 0 до 1 по хешу имени"""
+    return int.from_bytes(hashlib.sha1(host.encode('utf-8')).digest()[:8], 'big') / 2 ** 64
+
+
+class ContinuousScheduler:
+    """Очередь проверок по времени и пул из concurrency потоков"""
+
+    def __init__(self, hosts, run_audit, interval, window=None, high_interval=None, jitter=0.1,
+                 concurrency=2, on_result=None, clock=time.monotonic):
+        self.hosts = list(dict.fromkeys(hosts))
+        self.run_audit = run_audit
+        self.interval = interval
+        self.window = interval if window is None else window
+        self.high_interval = high_interval if high_interval and high_interval < interval else None
+        self.jitter = jitter
+        self.concurrency = max(concurrency, 1)
+        self.on_result = on_result
+        self.clock = clock
+        self.random = random.Random()
+        self.queue = []
+        self.in_flight = set()
+        self._stop = threading.Event()
+        self._slots = threading.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._high_due = {}
+
+    def _jittered(self, interval):
+        return interval * (1 + self.random.uniform(-self.jitter, self.jitter))
+
+    def plan(self):
+        """Первое расписание: машины по окну с шагом window / N и отклонением в пределах шага"""
+        start = self.clock()
+        ordered = sorted(self.hosts, key=_host_position)
+        step = self.window / len(ordered) if ordered else 0
+        for index, host in enumerate(ordered):
+            offset = index * step + self.random.uniform(0, step * self.jitter)
+            heapq.heappush(self.queue, (start + offset, host, FULL))
+            if self.high_interval:
+                # Проверка HIGH - в середине промежутка между полными проверками
+                self._schedule_high(host, start + offset + self.high_interval / 2)
+        return [(when - start, host, kind) for when, host, kind in sorted(self.queue)]
+
+    def _schedule_high(self, host, when):
+        self._high_due[host] = when
+        heapq.heappush(self.queue, (when, host, HIGH))
+
+    def _reschedule(self, host, kind, finished):
+        if kind == FULL:
+            heapq.heappush(self.queue, (finished + self._jittered(self.interval), host, FULL))
+            if self.high_interval:
+                # Полная проверка включает HIGH: следующая HIGH отсчитывается от нее
+                self._schedule_high(host, finished + self._jittered(self.high_interval))
+        else:
+            self._schedule_high(host, finished + self._jittered(self.high_interval))
+
+    def run(self):
+        """Цикл до stop(): ждет ближайшую проверку и запускает ее в свободном потоке"""
+        if not self.queue:
+            self.plan()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self._stop.is_set():
+                with self._lock:
+                    when, host, kind = self.queue[0] if self.queue else (None, None, None)
+                    delay = None if when is None else when - self.clock()
+                    if delay is not None and delay <= 0:
+                        heapq.heappop(self.queue)
+                if delay is None or delay > 0:
+                    self._stop.wait(1 if delay is None else min(delay, 1))
+                    continue
+                with self._lock:
+                    if kind == HIGH and (self._high_due.get(host) != when or host in self.in_flight):
+                        # Устаревшая HIGH: машина уже проверена или проверяется полностью
+                        continue
+                    if host in self.in_flight:
+                        # Полная проверка во время проверки HIGH той же машины - чуть позже
+                        heapq.heappush(self.queue, (self.clock() + 5, host, kind))
+                        continue
+                # Свободного потока нет - ждем: нагрузка остается ровной, проверки сдвигаются
+                while not self._slots.acquire(timeout=1):
+                    if self._stop.is_set():
+                        return
+                with self._lock:
+                    self.in_flight.add(host)
+                executor.submit(self._execute, host, kind)
+
+    def _execute(self, host, kind):
+        host_result = None
+        try:
+            host_result = self.run_audit(host, kind)
+        except Exception as e:
+            host_result = {'host': host, 'results': [], 'status': 'error', 'error': f"Ошибка: {e}"}
+        finally:
+            with self._lock:
+                self.in_flight.discard(host)
+                self._reschedule(host, kind, self.clock())
+            self._slots.release()
+        if self.on_result is not None and host_result is not None:
+            self.on_result(host_result, kind)
+
+    def next_runs(self, limit=5):
+        """Ближайшие проверки: [(через сколько секунд, машина, вид)]"""
+        now = self.clock()
+        with self._lock:
+            upcoming = [(when, host, kind) for when, host, kind in heapq.nsmallest(limit * 2, self.queue)
+                        if kind == FULL or self._high_due.get(host) == when]
+        return [(max(when - now, 0), host, kind) for when, host, kind in upcoming[:limit]]
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,320 @@
+"""Служба проверки: постоянный процесс с HTTP/JSON API и пулом SSH-сессий.
+
+Правила, кэш вердиктов и SSH-сессии с машинами остаются в памяти между
+запросами, поэтому повторная проверка одной машины (например, по заявке)
+не тратит время на запуск, разбор правил и вход по SSH.
+
+  GET  /health                        -> {ok, jobs, pooled}
+  POST /audits {hosts | group, wait}  -> {job, hosts} | отчет задания при wait
+  GET  /audits/<job>                  -> состояние и записи проверенных машин
+  GET  /audits/<job>/stream           -> NDJSON: запись машины сразу после проверки
+  GET  /audits/<job>/report           -> сводка задания
+  GET  /hosts/<host>                  -> последняя запись машины
+
+Все запросы - с заголовком X-Auth-Token, как у координатора.
+"""
+import itertools
+import json
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from src.check_result import result_to_json
+
+IDLE_TIMEOUT = 300
+MAX_JOBS = 200
+
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) and item for item in value)
+
+
+class PooledAuditor:
+    """Аудитор из пула: disconnect возвращает сессию в пул, а не закрывает ее"""
+
+    def __init__(self, auditor, pool, connected=False):
+        self.auditor = auditor
+        self.pool = pool
+        self.connected = connected
+
+    def connect(self):
+        if not self.connected:
+            self.connected = self.auditor.connect()
+        return self.connected
+
+    def disconnect(self):
+        if self.connected:
+            self.pool.release(self.auditor)
+        self.connected = False
+
+    def __getattr__(self, name):
+        return getattr(self.auditor, name)
+
+
+class ConnectionPool:
+    """Открытые сессии по машинам; неиспользуемые дольше idle_timeout закрываются"""
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, per_host=2):
+        self.idle_timeout = idle_timeout
+        self.per_host = per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._reap_loop, daemon=True).start()
+
+    def checkout(self, host, auditor):
+        """Живая сессия с машиной из пула или новый аудитор, который вернется в пул"""
+        while True:
+            with self._lock:
+                idle = self._idle.get(host)
+                pooled = idle.pop()[0] if idle else None
+            if pooled is None:
+                return PooledAuditor(auditor, self)
+            if pooled.is_connected():
+                return PooledAuditor(pooled, self, connected=True)
+            pooled.disconnect()
+
+    def release(self, auditor):
+        if not auditor.is_connected():
+            auditor.disconnect()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(auditor.hostname, [])
+            if len(idle) < self.per_host:
+                idle.append((auditor, time.monotonic()))
+                return
+        auditor.disconnect()
+
+    def size(self):
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def _reap_loop(self):
+        while not self._stop.wait(min(self.idle_timeout / 4, 30)):
+            deadline = time.monotonic() - self.idle_timeout
+            expired = []
+            with self._lock:
+                for host, idle in list(self._idle.items()):
+                    expired += [auditor for auditor, last_used in idle if last_used < deadline]
+                    idle[:] = [(auditor, last_used) for auditor, last_used in idle if last_used >= deadline]
+                    if not idle:
+                        del self._idle[host]
+            for auditor in expired:
+                auditor.disconnect()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for entries in idle.values():
+            for auditor, _ in entries:
+                auditor.disconnect()
+
+
+class AuditJob:
+    """Одно задание: список машин и записи по мере проверки"""
+
+    def __init__(self, job_id, hosts):
+        self.job_id = job_id
+        self.hosts = hosts
+        self.results = []
+        self.created = time.time()
+        self.finished = None
+        self._condition = threading.Condition()
+
+    def add(self, host_result):
+        with self._condition:
+            self.results.append(host_result)
+            if len(self.results) == len(self.hosts):
+                self.finished = time.time()
+            self._condition.notify_all()
+
+    def iter_results(self):
+        """Записи машин по мере поступления, пока задание не завершится"""
+        position = 0
+        while True:
+            with self._condition:
+                while position == len(self.results) and self.finished is None:
+                    self._condition.wait()
+                fresh = self.results[position:]
+                finished = self.finished is not None
+            yield from fresh
+            position += len(fresh)
+            if finished and position == len(self.results):
+                return
+
+    def wait(self):
+        for _ in self.iter_results():
+            pass
+
+    def state(self):
+        with self._condition:
+            return {
+                'job': self.job_id,
+                'status': 'finished' if self.finished is not None else 'running',
+                'total': len(self.hosts),
+                'done': len(self.results),
+                'results': list(self.results),
+            }
+
+    def report(self):
+        from src.result_matrix import ResultMatrix
+        state = self.state()
+        counts = ResultMatrix.from_results(state['results']).host_status_counts()
+        state['summary'] = dict(counts, total_hosts=len(state['results']))
+        state['duration'] = (self.finished or time.time()) - self.created
+        return state
+
+
+class AuditService:
+    """Задания проверки в общем пуле потоков и HTTP API к ним"""
+
+    def __init__(self, audit_func, audit_args, workers=8, inventory=None, token=None):
+        self.audit_func = audit_func
+        self.audit_args = audit_args
+        self.inventory = inventory
+        self.token = token or secrets.token_urlsafe(16)
+        self.jobs = {}
+        self.latest = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def resolve_hosts(self, body):
+        """Машины запроса: список hosts и/или группы инвентаря"""
+        if not isinstance(body, dict):
+            raise ValueError("Тело запроса должно быть объектом JSON")
+        hosts = body.get('hosts', [])
+        if not _is_string_list(hosts):
+            raise ValueError("hosts должен быть списком имен машин")
+        groups = body.get('group') or body.get('groups') or []
+        if isinstance(groups, str):
+            groups = [groups]
+        if not _is_string_list(groups):
+            raise ValueError("group должен быть именем группы или списком имен")
+        hosts = list(hosts)
+        if groups:
+            if self.inventory is None:
+                raise ValueError("Службе не передан инвентарь (--inventory)")
+            from src.inventory import Inventory
+            hosts += list(Inventory(self.inventory.path, groups))
+        hosts = list(dict.fromkeys(hosts))
+        if not hosts:
+            raise ValueError("Не указано ни одной машины")
+        return hosts
+
+    def submit(self, hosts):
+        job = AuditJob(f"{next(self._ids)}-{secrets.token_hex(3)}", hosts)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            # Старые завершенные задания не копятся в памяти бесконечно
+            finished = [job_id for job_id, old in self.jobs.items() if old.finished]
+            for job_id in finished[:max(len(finished) - MAX_JOBS, 0)]:
+                del self.jobs[job_id]
+        for host in hosts:
+            self._executor.submit(self._run, job, host)
+        return job
+
+    def _run(self, job, host):
+        try:
+            host_result = self.audit_func(host, *self.audit_args)
+        except Exception as e:
+            host_result = {'host': host, 'results': [], 'status': 'error', 'error': f"Ошибка: {e}"}
+        self.latest[host] = host_result
+        job.add(host_result)
+
+    def job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise LookupError(f"Нет задания {job_id}")
+        return job
+
+    def serve(self, bind_host='127.0.0.1', port=8780, pool=None):
+        """Запуск HTTP-сервера в фоновом потоке"""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _authorized(self):
+                if secrets.compare_digest(self.headers.get('X-Auth-Token', ''), service.token):
+                    return True
+                self.send_error(403)
+                return False
+
+            def _send_json(self, data, status=200):
+                payload = json.dumps(data, ensure_ascii=False, default=result_to_json).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                parts = [unquote(part) for part in self.path.strip('/').split('/')]
+                try:
+                    if parts == ['health']:
+                        self._send_json({'ok': True, 'jobs': len(service.jobs),
+                                         'pooled': pool.size() if pool is not None else 0})
+                    elif len(parts) == 2 and parts[0] == 'audits':
+                        self._send_json(service.job(parts[1]).state())
+                    elif len(parts) == 3 and parts[0] == 'audits' and parts[2] == 'report':
+                        self._send_json(service.job(parts[1]).report())
+                    elif len(parts) == 3 and parts[0] == 'audits' and parts[2] == 'stream':
+                        self._stream(service.job(parts[1]))
+                    elif len(parts) == 2 and parts[0] == 'hosts' and parts[1] in service.latest:
+                        self._send_json(service.latest[parts[1]])
+                    else:
+                        self.send_error(404)
+                except LookupError as e:
+                    # Сообщения на русском: в строку статуса HTTP они не помещаются
+                    self._send_json({'error': str(e)}, status=404)
+
+            def _stream(self, job):
+                # HTTP/1.0: без Content-Length, конец потока - закрытие соединения
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                for host_result in job.iter_results():
+                    line = json.dumps(host_result, ensure_ascii=False, default=result_to_json) + '\n'
+                    self.wfile.write(line.encode('utf-8'))
+                    self.wfile.flush()
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                if self.path.rstrip('/') != '/audits':
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                    hosts = service.resolve_hosts(body)
+                except (KeyError, ValueError, OSError) as e:
+                    self._send_json({'error': str(e)}, status=400)
+                    return
+                job = service.submit(hosts)
+                if body.get('wait'):
+                    job.wait()
+                    self._send_json(job.report())
+                else:
+                    self._send_json({'job': job.job_id, 'hosts': len(hosts)}, status=202)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((bind_host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
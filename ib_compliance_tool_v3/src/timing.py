@@ -0,0 +1,216 @@
+"""Замеры времени: подключение, команды, оценка правил, отчеты"""
+import functools
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SLOWEST_SPANS = 200
+
+
+class TimingRecorder:
+    """Сборщик интервалов (span) за один запуск аудита.
+
+    Интервал - кортеж (category, name, host, start, duration, pid, tid),
+    start отсчитывается от начала запуска в секундах. По каждой паре
+    (category, name) хранятся только количество, сумма и максимум, а из
+    самих интервалов - keep_slowest самых долгих: память не растет с
+    числом машин. Все интервалы хранятся только при keep_spans (нужны
+    для Chrome trace).
+    """
+
+    def __init__(self, keep_slowest=SLOWEST_SPANS):
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.enabled = True
+        self.keep_spans = False
+        self.keep_slowest = keep_slowest
+        self.stats = {}
+        self.slowest_spans = []
+        self.spans = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=True, keep_spans=False):
+        self.enabled = enabled
+        self.keep_spans = keep_spans
+
+    def settings(self):
+        """Настройки для передачи в рабочие процессы"""
+        return self.enabled, self.keep_spans
+
+    def add(self, category, name, host, start, duration):
+        if not self.enabled:
+            return
+        span = (category, name, host, start - self.origin, duration, os.getpid(), threading.get_ident())
+        with self._lock:
+            self._record(span)
+
+    def _record(self, span):
+        category, name, duration = span[0], span[1], span[4]
+        entry = self.stats.get((category, name))
+        if entry is None:
+            self.stats[category, name] = [duration, 1, duration]
+        else:
+            entry[0] += duration
+            entry[1] += 1
+            if duration > entry[2]:
+                entry[2] = duration
+        # Куча с минимумом наверху: новый интервал вытесняет самый короткий из сохраненных
+        item = (duration, next(self._order), span)
+        if len(self.slowest_spans) < self.keep_slowest:
+            heapq.heappush(self.slowest_spans, item)
+        elif duration > self.slowest_spans[0][0]:
+            heapq.heapreplace(self.slowest_spans, item)
+        if self.keep_spans:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, category, name, host=None):
+        """Контекстный менеджер для замера участка кода"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(category, name, host, start, time.perf_counter() - start)
+
+    def timed(self, category, name=None):
+        """Декоратор для замера функции целиком"""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(category, span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def drain(self):
+        """Забрать накопленные замеры и начать заново (для передачи из рабочих процессов)"""
+        with self._lock:
+            snapshot = {
+                'stats': self.stats,
+                'slowest': [span for _, _, span in self.slowest_spans],
+                'spans': self.spans,
+            }
+            self.stats, self.slowest_spans, self.spans = {}, [], []
+        return snapshot
+
+    def merge(self, snapshot):
+        """Добавить замеры, полученные drain() в другом процессе"""
+        with self._lock:
+            for key, (total, count, peak) in snapshot['stats'].items():
+                entry = self.stats.setdefault(key, [0.0, 0, 0.0])
+                entry[0] += total
+                entry[1] += count
+                entry[2] = max(entry[2], peak)
+            for span in snapshot['slowest']:
+                item = (span[4], next(self._order), span)
+                if len(self.slowest_spans) < self.keep_slowest:
+                    heapq.heappush(self.slowest_spans, item)
+                elif span[4] > self.slowest_spans[0][0]:
+                    heapq.heapreplace(self.slowest_spans, item)
+            if self.keep_spans:
+                self.spans.extend(snapshot['spans'])
+
+    def categories(self):
+        return sorted({category for category, _ in self.stats})
+
+    def totals(self, category):
+        """Суммарное время, количество и максимум интервалов категории по имени"""
+        with self._lock:
+            return {name: tuple(entry) for (entry_category, name), entry in self.stats.items()
+                    if entry_category == category}
+
+    def slowest(self, category, limit=10):
+        """Самые долгие элементы категории: [(имя, сумма, количество, максимум)]"""
+        totals = self.totals(category)
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        return [(k, total, count, peak) for k, (total, count, peak) in ranked[:limit]]
+
+    def _exported_spans(self):
+        if self.keep_spans:
+            return self.spans
+        return sorted((span for _, _, span in self.slowest_spans), key=lambda span: span[3])
+
+    def to_json(self):
+        return {
+            'started_at': self.started_at,
+            'spans': [
+                {'category': c, 'name': n, 'host': h, 'start': round(s, 6), 'duration': round(d, 6),
+                 'pid': pid, 'tid': tid}
+                for c, n, h, s, d, pid, tid in self._exported_spans()
+            ],
+            'spans_complete': self.keep_spans,
+            'totals': {
+                category: {str(name): {'total': round(total, 6), 'count': count, 'max': round(peak, 6)}
+                           for name, (total, count, peak) in self.totals(category).items()}
+                for category in self.categories()
+            },
+        }
+
+    def to_chrome_trace(self):
+        """Формат chrome://tracing / Perfetto"""
+        events = []
+        for category, name, host, start, duration, pid, tid in self._exported_spans():
+            event = {
+                'name': str(name),
+                'cat': category,
+                'ph': 'X',
+                'ts': int(start * 1e6),
+                'dur': max(int(duration * 1e6), 1),
+                'pid': pid,
+                'tid': tid,
+            }
+            if host:
+                event['args'] = {'host': host}
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_openmetrics(self):
+        """Суммарные времена в текстовом формате OpenMetrics"""
+        lines = [
+            '# TYPE compliance_span_seconds summary',
+            '# UNIT compliance_span_seconds seconds',
+            '# HELP compliance_span_seconds Time spent per audit stage',
+        ]
+        for category in self.categories():
+            for name, (total, count, _) in sorted(self.totals(category).items(), key=lambda i: str(i[0])):
+                labels = f'category="{_escape_label(category)}",name="{_escape_label(name)}"'
+                lines.append(f'compliance_span_seconds_count{{{labels}}} {count}')
+                lines.append(f'compliance_span_seconds_sum{{{labels}}} {total:.6f}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, base_filename, formats=()):
+        """Сохранение замеров: всегда JSON, дополнительно chrome и/или openmetrics"""
+        saved = []
+        json_filename = f"{base_filename}.json"
+        with open(json_filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, ensure_ascii=False)
+        saved.append(json_filename)
+
+        if 'chrome' in formats:
+            trace_filename = f"{base_filename}.trace.json"
+            with open(trace_filename, 'w', encoding='utf-8') as f:
+                json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+            saved.append(trace_filename)
+
+        if 'openmetrics' in formats:
+            metrics_filename = f"{base_filename}.prom"
+            with open(metrics_filename, 'w', encoding='utf-8') as f:
+                f.write(self.to_openmetrics())
+            saved.append(metrics_filename)
+        return saved
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Общий сборщик на процесс
+TIMINGS = TimingRecorder()
@@ -0,0 +1,51 @@
+import json
+
+from src.check_result import (MAX_ACTUAL_LENGTH, CheckResult, compact_text, host_result_from_dict,
+                              intern_rule_meta, result_to_json)
+
+RULE = intern_rule_meta('rule', 'Rule', 'text', 'HIGH', 'expected')
+
+
+def reload(result):
+    host_result = {'host': 'h', 'status': 'completed', 'results': [result]}
+    data = json.loads(json.dumps(host_result, default=result_to_json))
+    return host_result_from_dict(data)['results'][0]
+
+
+def test_short_text_is_kept():
+    assert compact_text('short') == 'short'
+    assert compact_text(None) is None
+
+
+def test_long_text_is_truncated_with_length_and_hash():
+    text = compact_text('a' * 5000)
+    assert text.startswith('a' * MAX_ACTUAL_LENGTH + '... [обрезано, 5000 симв., sha256:')
+
+
+def test_compact_text_is_idempotent():
+    text = compact_text('a' * 5000)
+    assert compact_text(text) == text
+
+
+def test_truncated_actual_survives_json_round_trip():
+    result = CheckResult(RULE, 'FAIL', 'a' * 5000, 'b' * 3000, 'e' * 4000)
+    loaded = reload(result)
+    assert loaded.to_dict() == result.to_dict()
+    assert '5000 симв.' in loaded['actual']
+    assert '3000 симв.' in loaded['actual_display']
+    # И повторная загрузка ничего не меняет
+    assert reload(loaded).to_dict() == result.to_dict()
+
+
+def test_display_equal_to_actual_is_not_stored():
+    result = CheckResult(RULE, 'PASS', 'output', 'output')
+    assert result.display is None
+    assert result['actual_display'] == 'output'
+    assert reload(result).display is None
+
+
+def test_dict_access():
+    result = CheckResult(RULE, 'ERROR', error='boom')
+    assert result['id'] == 'rule' and result['severity'] == 'HIGH'
+    assert 'actual' not in result and result.get('actual', '-') == '-'
+    assert result.to_dict()['error'] == 'boom'
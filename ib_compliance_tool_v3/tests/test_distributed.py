@@ -0,0 +1,98 @@
+import threading
+import time
+
+from src import distributed
+from src.distributed import Coordinator, run_worker
+
+
+def result(host):
+    return {'host': host, 'results': [], 'status': 'completed', 'summary': {'passed': 0, 'failed': 0}}
+
+
+def test_lease_carries_host_settings():
+    settings = {'h1': {'group': 'buh', 'rules': 'buh.yaml', 'bastions': ['jump']}}
+    coordinator = Coordinator(['h1', 'h2'], unit_size=2, host_settings=settings.get)
+    lease = coordinator.lease('w1')
+    assert lease['hosts'] == ['h1', 'h2']
+    assert lease['settings'] == settings
+
+
+def test_steal_waits_for_owner_to_release_hosts():
+    coordinator = Coordinator([f"h{i}" for i in range(6)], unit_size=6)
+    first = coordinator.lease('w1')
+    # Свободный узел не получает машины сразу: они могут уже проверяться
+    assert coordinator.lease('w2') == {'wait': 1}
+    revoke = coordinator.heartbeat('w1', first['unit'])['revoke']
+    assert revoke == ['h3', 'h4', 'h5']
+    # h3 уже проверяется первым узлом - он возвращает только не начатые
+    coordinator.release('w1', first['unit'], ['h4', 'h5'])
+    second = coordinator.lease('w2')
+    assert second['hosts'] == ['h4', 'h5']
+    assert coordinator.heartbeat('w1', first['unit']) == {'hosts': ['h0', 'h1', 'h2', 'h3'], 'revoke': []}
+
+
+def test_expired_lease_is_redispatched():
+    coordinator = Coordinator(['h1', 'h2'], unit_size=2, lease_timeout=0.01)
+    first = coordinator.lease('w1')
+    coordinator.add_result('w1', first['unit'], result('h1'))
+    time.sleep(0.02)
+    assert coordinator.lease('w2')['hosts'] == ['h2']
+    assert coordinator.heartbeat('w1', first['unit']) == {'lost': True}
+
+
+def test_workers_audit_each_host_once():
+    hosts = [f"h{i}" for i in range(40)]
+    coordinator = Coordinator(hosts, unit_size=20, lease_timeout=0.6)
+    address = coordinator.serve('127.0.0.1', 0)
+    url = f"http://127.0.0.1:{address[1]}"
+    audited = []
+    lock = threading.Lock()
+
+    def audit(host, settings=None):
+        with lock:
+            audited.append(host)
+        time.sleep(0.05)
+        return result(host)
+
+    workers = [threading.Thread(target=run_worker, args=(url, coordinator.token, audit, ()),
+                                kwargs={'threads': 2, 'worker_id': f"w{i}"}) for i in range(3)]
+    try:
+        for worker in workers:
+            worker.start()
+        received = list(coordinator.iter_results())
+        for worker in workers:
+            worker.join(timeout=10)
+    finally:
+        coordinator.shutdown()
+    assert sorted(r['host'] for r in received) == sorted(hosts)
+    assert sorted(audited) == sorted(hosts)
+
+
+def test_heartbeat_survives_malformed_reply(monkeypatch):
+    coordinator = Coordinator(['h1', 'h2', 'h3'], unit_size=3, lease_timeout=0.3)
+    address = coordinator.serve('127.0.0.1', 0)
+    original = distributed.CoordinatorClient.call
+    broken = []
+    heartbeats = []
+
+    def call(self, path, body):
+        if path == '/heartbeat':
+            heartbeats.append(path)
+        if path == '/heartbeat' and not broken:
+            broken.append(path)
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+        return original(self, path, body)
+
+    monkeypatch.setattr(distributed.CoordinatorClient, 'call', call)
+
+    def audit(host):
+        time.sleep(0.2)
+        return result(host)
+
+    try:
+        run_worker(f"http://127.0.0.1:{address[1]}", coordinator.token, audit, (), threads=1)
+    finally:
+        coordinator.shutdown()
+    # Поток heartbeat не завершился на испорченном ответе и продолжил продлевать аренду
+    assert broken and len(heartbeats) > 1
+    assert coordinator.finished
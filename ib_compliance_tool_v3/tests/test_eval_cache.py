@@ -0,0 +1,64 @@
+import json
+import os
+
+from src.check_result import intern_rule_meta
+from src.eval_cache import EvaluationCache, get_evaluation_cache
+from src.parallel import iter_sharded_results
+
+RULE = intern_rule_meta('rule', 'Rule', 'text', 'MEDIUM', 'x')
+
+
+def evaluate(rule_type, expected, output):
+    return ('PASS' if expected in output else 'FAIL'), output
+
+
+def audit_with_cache(host, cache_path, verdicts):
+    cache = get_evaluation_cache(cache_path, 'test')
+    for index in range(verdicts):
+        cache.evaluate(RULE, f"{host}-{index}", evaluate)
+    return {'host': host, 'results': [], 'status': 'completed'}
+
+
+def test_display_equal_to_output_is_not_stored():
+    cache = EvaluationCache()
+    output = 'x' * 5000
+    assert cache.evaluate(RULE, output, evaluate) == ('PASS', output)
+    assert list(cache.entries.values()) == [('PASS', None)]
+    # Из кэша actual_display восстанавливается по выводу
+    assert cache.evaluate(RULE, output, evaluate) == ('PASS', output)
+    assert cache.hits == 1
+
+
+def test_cache_is_bounded():
+    cache = EvaluationCache(max_entries=10)
+    for index in range(25):
+        cache.evaluate(RULE, str(index), evaluate)
+    assert len(cache.entries) == 10
+    assert cache.key(RULE, '24') in cache.entries
+    assert cache.key(RULE, '0') not in cache.entries
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = EvaluationCache(path, 'test')
+    cache.evaluate(RULE, 'x1', evaluate)
+    cache.evaluate(RULE, 'long ' * 1000, lambda *args: ('FAIL', 'bad ' * 1000))
+    cache.save()
+    loaded = EvaluationCache(path, 'test')
+    assert loaded.entries == cache.entries
+    # Полный вывод команды в файл кэша не попадает
+    assert 'long long' not in open(path, encoding='utf-8').read()
+    # Кэш другой версии оценщика не используется
+    assert EvaluationCache(path, 'other').entries == {}
+
+
+def test_cache_is_saved_by_worker_processes(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    hosts = [f"host{index}" for index in range(8)]
+    events = list(iter_sharded_results(hosts, audit_with_cache, (path, 500), processes=2, threads=2))
+    assert sum(kind == 'finished' for kind, _, _ in events) == len(hosts)
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)['entries']
+    assert len(entries) == len(hosts) * 500
+    # Временные файлы прерванной записи не остаются
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
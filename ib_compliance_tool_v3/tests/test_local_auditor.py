@@ -0,0 +1,72 @@
+import io
+import tarfile
+
+import pytest
+
+from src.drift import rule_input_paths
+from src.local_auditor import LocalAuditor, SnapshotUnsupported, command_programs
+
+NTP_COMMAND = "grep '^NTP\\|^FallbackNTP' /etc/systemd/timesyncd.conf 2>/dev/null"
+
+
+def test_command_programs_respects_quotes():
+    assert command_programs(NTP_COMMAND) == ['grep']
+    assert command_programs("grep 'a;b' /etc/x | grep -v '#' && echo \"x|y\"") == ['grep', 'grep', 'echo']
+
+
+def test_command_programs_splits_all_separators():
+    assert command_programs("cat /a || true; FOO=1 head /b & ls /c 2>&1") == ['cat', 'true', 'head', 'ls']
+
+
+def test_drift_sees_files_of_quoted_pipe_command():
+    assert rule_input_paths(NTP_COMMAND) == ('/etc/systemd/timesyncd.conf',)
+    assert rule_input_paths("systemctl is-enabled ssh") is None
+
+
+def _make_snapshot_tar(path, files):
+    with tarfile.open(path, 'w') as tar:
+        for name, text in files.items():
+            data = text.encode('utf-8')
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    (tmp_path / 'etc' / 'systemd').mkdir(parents=True)
+    (tmp_path / 'etc' / 'systemd' / 'timesyncd.conf').write_text('[Time]\nNTP=ntp1.vniiftri.ru\n#NTP=x\n')
+    return tmp_path
+
+
+def test_quoted_pipe_command_runs_on_directory_snapshot(snapshot_dir):
+    auditor = LocalAuditor('host', root=str(snapshot_dir))
+    assert auditor.connect()
+    try:
+        output, _ = auditor.execute_command(NTP_COMMAND)
+    finally:
+        auditor.disconnect()
+    assert output == 'NTP=ntp1.vniiftri.ru'
+
+
+def test_live_system_command_is_rejected(snapshot_dir):
+    auditor = LocalAuditor('host', root=str(snapshot_dir))
+    assert auditor.connect()
+    with pytest.raises(SnapshotUnsupported):
+        auditor.execute_command("systemctl is-active auditd")
+    auditor.disconnect()
+
+
+def test_tar_snapshot_keeps_hidden_file_names(tmp_path):
+    archive = str(tmp_path / 'host.tar')
+    _make_snapshot_tar(archive, {
+        './etc/skel/.bashrc': 'TMOUT=900\n',
+        './.profile': 'umask 027\n',
+    })
+    auditor = LocalAuditor('host', root=archive)
+    assert auditor.connect()
+    try:
+        assert auditor.execute_command("grep TMOUT /etc/skel/.bashrc")[0] == 'TMOUT=900'
+        assert auditor.execute_command("cat /.profile")[0] == 'umask 027'
+    finally:
+        auditor.disconnect()
@@ -0,0 +1,60 @@
+import asyncio
+import socket
+
+from src import reachability
+from src.reachability import probe_host, scan_hosts
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_unknown_name_is_unreachable_with_readable_reason():
+    reachable, reason = run(probe_host('no-such-host.invalid', 1.0))
+    assert reachable is False
+    assert 'Unknown error' not in reason and reason.startswith('имя не найдено')
+
+
+def test_closed_port_is_unreachable():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    reachable, reason = run(probe_host('127.0.0.1', 1.0, port=port))
+    assert reachable is False and reason == f"порт {port}: Connection refused"
+
+
+def test_open_port_is_reachable():
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        port = server.getsockname()[1]
+        assert scan_hosts(['127.0.0.1'], 1.0, port=port) == {'127.0.0.1': (True, f"порт {port} открыт")}
+
+
+def test_slow_lookup_is_unknown_not_unreachable(monkeypatch):
+    async def slow_resolve(host, port, timeout):
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr(reachability, 'resolve_host', slow_resolve)
+    reachable, reason = run(probe_host('slow.example', 1.0))
+    assert reachable is None and reason.startswith('имя не разрешилось')
+
+
+def test_queued_probes_get_full_timeout(monkeypatch):
+    live = {f"10.0.0.{index}" for index in range(20)}
+
+    async def open_connection(host, port):
+        if host not in live:
+            await asyncio.sleep(10)
+
+        class Writer:
+            def close(self):
+                pass
+        await asyncio.sleep(0.05)
+        return None, Writer()
+
+    monkeypatch.setattr(asyncio, 'open_connection', open_connection)
+    dead = [f"10.0.1.{index}" for index in range(50)]
+    scan = scan_hosts(dead + sorted(live), timeout=0.2, concurrency=10)
+    assert all(scan[host][0] for host in live)
+    assert not any(scan[host][0] for host in dead)
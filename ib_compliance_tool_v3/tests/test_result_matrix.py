@@ -0,0 +1,67 @@
+import pytest
+
+import src.result_matrix as result_matrix
+from src.check_result import CheckResult, intern_rule_meta
+from src.result_matrix import ResultMatrix, default_host_group
+
+RULES = [intern_rule_meta(f"r{i}", f"Rule {i}", 'text', 'HIGH' if i == 0 else 'LOW', 'x') for i in range(3)]
+
+
+def host(name, statuses, group=None, as_dict=False):
+    results = [CheckResult(rule, status) for rule, status in zip(RULES, statuses)]
+    if as_dict:
+        results = [result.to_dict() for result in results]
+    return {'host': name, 'status': 'completed', 'results': results, 'group': group}
+
+
+def fleet(as_dict=False):
+    return [
+        host('a', ['FAIL', 'PASS', 'NOT_APPLICABLE'], 'g1', as_dict),
+        host('b', ['FAIL', 'NOT_APPLICABLE', 'FAIL'], 'g1', as_dict),
+        host('c', ['PASS', 'FAIL', 'WEIRD'], 'g2', as_dict),
+        {'host': 'd', 'status': 'unreachable', 'results': [], 'group': 'g2'},
+    ]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'fallback'])
+def numpy_mode(request, monkeypatch):
+    if request.param:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(result_matrix, '_NUMPY', None)
+
+
+def test_not_applicable_is_excluded_from_totals(numpy_mode):
+    matrix = ResultMatrix.from_results(fleet())
+    assert matrix.host_scores() == [(1, 1, 2), (0, 2, 2), (1, 1, 3), (0, 0, 0)]
+    rows = {row['rule_id']: row for row in matrix.rule_group_failures()}
+    assert rows['r0']['groups'] == {'g1': (2, 2), 'g2': (0, 1)}
+    assert rows['r1']['groups'] == {'g1': (0, 1), 'g2': (1, 1)}
+    assert (rows['r2']['failed'], rows['r2']['total']) == (1, 2)
+
+
+def test_dict_and_check_result_rows_give_same_aggregates(numpy_mode):
+    objects = ResultMatrix.from_results(fleet())
+    dicts = ResultMatrix.from_results(fleet(as_dict=True))
+    assert objects.rule_group_failures() == dicts.rule_group_failures()
+    assert objects.host_scores() == dicts.host_scores()
+    assert objects.rule_meta == dicts.rule_meta
+
+
+def test_unknown_status_is_counted_as_error():
+    counts = ResultMatrix.from_results(fleet()).check_status_counts()
+    assert counts['ERROR'] == 1
+    assert counts['NONE'] == 0
+
+
+def test_hosts_with_same_rules_share_one_row():
+    matrix = ResultMatrix.from_results(fleet())
+    assert len(matrix.rows) == 1
+    assert list(matrix.host_row) == [0, 0, 0, -1]
+
+
+def test_default_host_group():
+    assert default_host_group('192.168.1.77') == '192.168.1.0/24'
+    assert default_host_group('2001:db8::1') == '2001:db8::/64'
+    assert default_host_group('web.corp.local') == 'corp.local'
+    assert default_host_group('web') == 'default'
@@ -0,0 +1,55 @@
+import pytest
+
+import main
+from src.scheduler import FULL, ContinuousScheduler
+
+
+class Interrupted(BaseException):
+    pass
+
+
+def scheduler(run_audit, results):
+    return ContinuousScheduler(['h1'], run_audit, interval=60, jitter=0.1, concurrency=1,
+                               on_result=lambda result, kind: results.append(result), clock=lambda: 0.0)
+
+
+def test_audit_error_becomes_error_result():
+    def run_audit(host, kind):
+        raise RuntimeError('boom')
+
+    results = []
+    sched = scheduler(run_audit, results)
+    sched._slots.acquire()
+    sched.in_flight.add('h1')
+    sched._execute('h1', FULL)
+    assert results[0]['status'] == 'error' and 'boom' in results[0]['error']
+    assert not sched.in_flight
+    assert [(host, kind) for _, host, kind in sched.queue] == [('h1', FULL)]
+
+
+def test_interrupted_audit_is_rescheduled_without_result():
+    def run_audit(host, kind):
+        raise Interrupted()
+
+    results = []
+    sched = scheduler(run_audit, results)
+    sched._slots.acquire()
+    sched.in_flight.add('h1')
+    with pytest.raises(Interrupted):
+        sched._execute('h1', FULL)
+    assert results == []
+    assert not sched.in_flight
+    # Слот потока освобожден
+    assert sched._slots.acquire(blocking=False)
+
+
+@pytest.mark.parametrize('value', ['0', '0.5', '0.99'])
+def test_jitter_accepts_fraction(value):
+    assert main.parse_args(['--jitter', value]).jitter == float(value)
+
+
+@pytest.mark.parametrize('value', ['-0.1', '1', '2', 'abc'])
+def test_jitter_rejects_out_of_range(value, capsys):
+    with pytest.raises(SystemExit):
+        main.parse_args(['--jitter', value])
+    assert '--jitter' in capsys.readouterr().err
@@ -0,0 +1,79 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.service import AuditJob, AuditService
+
+
+def audit(host, prefix):
+    return {'host': host, 'results': [], 'status': 'completed', 'summary': {'passed': 1, 'failed': 0}}
+
+
+@pytest.fixture
+def service():
+    service = AuditService(audit, ('x',), workers=2, token='secret')
+    address = service.serve('127.0.0.1', 0)
+    service.url = f"http://127.0.0.1:{address[1]}"
+    yield service
+    service.shutdown()
+
+
+def post(service, body, raw=None):
+    data = raw if raw is not None else json.dumps(body).encode('utf-8')
+    request = urllib.request.Request(service.url + '/audits', data=data, method='POST',
+                                     headers={'X-Auth-Token': 'secret', 'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+@pytest.mark.parametrize('body', [
+    {'hosts': 'srv1'},
+    {'hosts': [1, 2]},
+    {'hosts': ['']},
+    {'hosts': {'srv1': True}},
+    {'group': 5},
+    ['srv1'],
+    'srv1',
+    {},
+])
+def test_invalid_requests_are_rejected(service, body):
+    status, reply = post(service, body)
+    assert status == 400
+    assert 'error' in reply
+    assert not service.jobs
+
+
+def test_malformed_json_is_rejected(service):
+    assert post(service, None, raw=b'{not json')[0] == 400
+
+
+def test_group_without_inventory_is_rejected(service):
+    status, reply = post(service, {'group': 'buh'})
+    assert status == 400 and 'инвентарь' in reply['error']
+
+
+def test_audit_with_wait_returns_report(service):
+    status, reply = post(service, {'hosts': ['srv1', 'srv2', 'srv1'], 'wait': True})
+    assert status == 200
+    assert sorted(r['host'] for r in reply['results']) == ['srv1', 'srv2']
+    assert reply['summary']['completed'] == 2
+
+
+def test_requests_need_token(service):
+    request = urllib.request.Request(service.url + '/health')
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request, timeout=10)
+    assert error.value.code == 403
+
+
+def test_job_streams_results_until_finished():
+    job = AuditJob('1', ['a', 'b'])
+    job.add({'host': 'a'})
+    job.add({'host': 'b'})
+    assert [r['host'] for r in job.iter_results()] == ['a', 'b']
+    assert job.state()['status'] == 'finished'